@@ -0,0 +1,24 @@
+# =================================================================================
+# 🧪 AMBIENTE COMUM DOS SCRIPTS DE BENCHMARK E VERIFICAÇÃO
+# =================================================================================
+# Importa o main do bot a partir da raiz do repositório, com o espelho SQLite num arquivo descartável
+# (o espelho só abre o banco no primeiro uso, então trocá-lo logo após o import basta).
+#
+# Uso (antes de importar fakes, que também importa o main):
+#   from ambiente import RAIZ, importar_main
+#   main = importar_main("bench_bot_")
+import logging
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+def importar_main(prefixo, silenciar_logs=True):
+    """Importa o main com o espelho SQLite num diretório temporário ('prefixo'). Retorna o módulo."""
+    if silenciar_logs:
+        logging.disable(logging.CRITICAL) # Sem credenciais o main loga erro de autorização no import; irrelevante aqui
+    import main
+    main.ESPELHO = main.EspelhoHistorico(os.path.join(tempfile.mkdtemp(prefix=prefixo), "historico.db"))
+    return main
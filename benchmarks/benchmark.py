@@ -0,0 +1,230 @@
+# =================================================================================
+# ⏱️ BENCHMARKS DOS CAMINHOS QUENTES DO BOT (OFFLINE)
+# =================================================================================
+# Gera ligas sintéticas (1k / 10k / 100k jogos, 20 a 500 times) e mede, sem rede:
+#   - calcular_estatisticas_time (últimos N e temporada), listar_ultimos_jogos, formatar_estatisticas
+#   - materializar_estatisticas (custo do refresh horário) e carga em lote de abas (gspread fake)
+#   - buscar_jogos (parse de /matches servido por uma football-data.org fake via httpx.MockTransport)
+#   - calcular_estatisticas_confronto (H2H pelo índice de pares)
+#   - callback_query_handler (despacho STATS_FILTRO / RESULTADOS_FILTRO / H2H_FILTRO com Update/Context fakes)
+#
+# Uso:
+#   python benchmarks/benchmark.py                          -> JSON no stdout
+#   python benchmarks/benchmark.py --saida base.json        -> grava o resultado
+#   python benchmarks/benchmark.py --comparar base.json     -> sai com código 1 se algo ficou mais lento que a tolerância
+#   python benchmarks/benchmark.py --rapido                 -> só a liga de 1k jogos (CI)
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+from ambiente import RAIZ, importar_main
+main = importar_main("bench_bot_")
+from fakes import AbaFake, gerar_linhas, gerar_partidas_api, instalar_gspread_fake
+
+# (nome, jogos, times)
+CENARIOS = [
+    ("1k", 1_000, 20),
+    ("10k", 10_000, 100),
+    ("100k", 100_000, 500),
+]
+TEMPO_MINIMO_SEGUNDOS = 0.25 # Cada medição repete a função até somar pelo menos isso
+
+# =================================================================================
+# 🧪 FAKES EM PROCESSO (API VIA MOCKTRANSPORT, UPDATE/CONTEXT DO TELEGRAM)
+# =================================================================================
+def instalar_api_fake(payload):
+    """football-data.org em memória: o ClienteAPI do bot passa a usar um httpx.MockTransport, sem cota."""
+    corpo = json.dumps(payload).encode()
+    transporte = httpx.MockTransport(lambda req: httpx.Response(200, content=corpo, headers={"Content-Type": "application/json"}))
+    main.CLIENTE_API._cliente = httpx.AsyncClient(base_url=main.API_BASE_URL, transport=transporte)
+    main.CLIENTE_API._limite = asyncio.Semaphore(main.API_MAX_CONEXOES)
+    main.LIMITADOR_API = main.LimitadorTaxa(10**9, rajada=10**9)
+    main._ETAGS_PARTIDAS.clear()
+
+class MensagemFake:
+    chat_id = 1
+    message_id = 1
+    async def reply_text(self, *args, **kwargs): return self
+    async def edit_text(self, *args, **kwargs): return self
+    async def delete(self): return True
+
+class QueryFake:
+    def __init__(self, data):
+        self.data = data
+        self.message = MensagemFake()
+    async def answer(self, *args, **kwargs): return True
+    async def edit_message_text(self, *args, **kwargs): return self.message
+    async def edit_message_reply_markup(self, *args, **kwargs): return self.message
+
+class UpdateFake:
+    def __init__(self, data):
+        self.callback_query = QueryFake(data)
+        self.effective_message = self.callback_query.message
+
+class ContextFake:
+    def __init__(self, chat_data): self.chat_data = chat_data
+
+# =================================================================================
+# 📏 MEDIÇÃO
+# =================================================================================
+def _resumo(nome, cenario, amostras_ns, **extras):
+    amostras = np.array(amostras_ns, dtype=np.float64) / 1000.0 # µs
+    return {
+        "nome": nome, "cenario": cenario, "iteracoes": len(amostras),
+        "media_us": round(float(amostras.mean()), 3),
+        "p50_us": round(float(np.percentile(amostras, 50)), 3),
+        "p95_us": round(float(np.percentile(amostras, 95)), 3),
+        "min_us": round(float(amostras.min()), 3),
+        **extras,
+    }
+
+def medir(nome, cenario, func, *args, minimo=5, **extras):
+    amostras, total = [], 0
+    while total < TEMPO_MINIMO_SEGUNDOS * 1e9 or len(amostras) < minimo:
+        inicio = time.perf_counter_ns()
+        func(*args)
+        decorrido = time.perf_counter_ns() - inicio
+        amostras.append(decorrido)
+        total += decorrido
+    return _resumo(nome, cenario, amostras, **extras)
+
+async def medir_async(nome, cenario, func, *args, minimo=5, preparar=None, **extras):
+    amostras, total = [], 0
+    while total < TEMPO_MINIMO_SEGUNDOS * 1e9 or len(amostras) < minimo:
+        if preparar: preparar()
+        inicio = time.perf_counter_ns()
+        await func(*args)
+        decorrido = time.perf_counter_ns() - inicio
+        amostras.append(decorrido)
+        total += decorrido
+    return _resumo(nome, cenario, amostras, **extras)
+
+# =================================================================================
+# 🏃 SUÍTE
+# =================================================================================
+async def rodar_cenario(cenario, n_jogos, n_times):
+    resultados = []
+    meta = {"jogos": n_jogos, "times": n_times}
+    aba = "PL" # Qualquer liga do LIGAS_MAP serve: os dados são sintéticos
+
+    linhas = gerar_linhas(n_jogos, n_times)
+    instalar_gspread_fake([AbaFake(aba, linhas), AbaFake(main.LIGAS_MAP[aba]['sheet_future'], [main.CABECALHO_FJ])])
+
+    # Carga a frio a partir da planilha (leitura em lote + parse + índice + materialização)
+    def carga_a_frio():
+        with main.ESPELHO._lock: main.ESPELHO._conn.execute("DELETE FROM jogos WHERE liga = ?", (aba,))
+        main.carregar_em_lote([aba], [])
+    resultados.append(medir("carga_planilha_em_lote", cenario, carga_a_frio, minimo=1, **meta))
+    resultados.append(medir("carga_espelho_sqlite", cenario, main.carregar_em_lote, [aba], [], minimo=1, **meta))
+
+    historico = main.SHEET_CACHE.obter(aba)
+    resultados.append(medir("materializar_estatisticas", cenario, main.materializar_estatisticas, historico, minimo=1, **meta))
+
+    # Time com mais jogos = pior caso do filtro
+    contagem = np.bincount(np.concatenate([historico.mandante, historico.visitante]), minlength=len(historico.times))
+    mandante = historico.times[int(contagem.argmax())]
+    visitante = historico.times[int(np.argsort(contagem)[-2])]
+
+    for ultimos, casa_fora in ((main.ULTIMOS, None), (main.ULTIMOS, "casa"), (None, None), (20, "fora")):
+        filtro = f"ultimos={ultimos},casa_fora={casa_fora}"
+        resultados.append(medir("calcular_estatisticas_time", cenario, main.calcular_estatisticas_time,
+                                mandante, aba, ultimos, casa_fora, historico, filtro=filtro, **meta))
+        resultados.append(medir("listar_ultimos_jogos", cenario, main.listar_ultimos_jogos,
+                                mandante, aba, ultimos, casa_fora, historico, filtro=filtro, **meta))
+    # Janela "Temporada" (intervalo de datas) do menu
+    desde = main.inicio_temporada(aba, historico)
+    for casa_fora in (None, "casa"):
+        resultados.append(medir("calcular_estatisticas_time", cenario, main.calcular_estatisticas_time,
+                                mandante, aba, None, casa_fora, historico, desde, filtro=f"temporada,casa_fora={casa_fora}", **meta))
+    resultados.append(medir("calcular_estatisticas_confronto", cenario, main.calcular_estatisticas_confronto,
+                            mandante, visitante, historico, **meta))
+    estatisticas = main.calcular_estatisticas_time(mandante, aba, None, None, historico)
+    resultados.append(medir("formatar_estatisticas", cenario, main.formatar_estatisticas, estatisticas, **meta))
+    resultados.append(medir("calcular_estatisticas_liga", cenario, main.calcular_estatisticas_liga, aba, main.ULTIMOS, None, historico, minimo=1, **meta))
+
+    # /matches com o mesmo volume de partidas
+    instalar_api_fake(gerar_partidas_api(n_jogos, n_times))
+    resultados.append(await medir_async("buscar_jogos", cenario, main.buscar_jogos, aba, minimo=1, **meta))
+    resultados.append(medir("separar_partidas", cenario, main.separar_partidas, gerar_partidas_api(n_jogos, n_times)["matches"], minimo=1, **meta))
+    await main.CLIENTE_API.fechar()
+
+    # Despacho do callback como chega do Telegram (a frio = sem texto renderizado no cache)
+    chat_data = {'current_mandante': mandante, 'current_visitante': visitante, 'current_aba_code': aba}
+    for tipo in ("STATS_FILTRO", "RESULTADOS_FILTRO", "H2H_FILTRO"):
+        for idx, filtro in enumerate(main.CONFRONTO_FILTROS):
+            if filtro[1] != tipo: continue
+            dados = f"{tipo}|{idx}"
+            despachar = lambda d=dados: main.callback_query_handler(UpdateFake(d), ContextFake(chat_data))
+            resultados.append(await medir_async("callback_query_handler", cenario, despachar,
+                                                preparar=main.TEXTO_CACHE._entradas.clear, callback=dados, cache_texto="frio", **meta))
+            resultados.append(await medir_async("callback_query_handler", cenario, despachar,
+                                                callback=dados, cache_texto="quente", **meta))
+    return resultados
+
+def _chave(r):
+    return "|".join(f"{k}={r[k]}" for k in sorted(r) if k not in ("iteracoes", "media_us", "p50_us", "p95_us", "min_us"))
+
+def comparar(atual, base, tolerancia):
+    """Lista as medições cujo p50 piorou mais que 'tolerancia' (fração) em relação à base."""
+    anteriores = {_chave(r): r for r in base["resultados"]}
+    regressoes = []
+    for r in atual["resultados"]:
+        anterior = anteriores.get(_chave(r))
+        if anterior and anterior["p50_us"] > 0 and r["p50_us"] > anterior["p50_us"] * (1 + tolerancia):
+            regressoes.append({"medicao": _chave(r), "base_p50_us": anterior["p50_us"], "atual_p50_us": r["p50_us"],
+                               "variacao": round(r["p50_us"] / anterior["p50_us"] - 1, 3)})
+    return regressoes
+
+def _commit_atual():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True).stdout.strip() or None
+    except Exception: return None
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Benchmarks offline dos caminhos quentes do bot.")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Piora máxima aceita no p50 (fração, padrão 0.25)")
+    parser.add_argument("--rapido", action="store_true", help="Roda só o cenário de 1k jogos")
+    args = parser.parse_args()
+
+    cenarios = CENARIOS[:1] if args.rapido else CENARIOS
+    resultados = []
+    for nome, n_jogos, n_times in cenarios:
+        print(f"⏱️ Cenário {nome}: {n_jogos} jogos, {n_times} times...", file=sys.stderr)
+        resultados.extend(asyncio.run(rodar_cenario(nome, n_jogos, n_times)))
+
+    relatorio = {
+        "meta": {
+            "commit": _commit_atual(),
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+        },
+        "resultados": resultados,
+    }
+
+    codigo = 0
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            relatorio["regressoes"] = comparar(relatorio, json.load(f), args.tolerancia)
+        for r in relatorio["regressoes"]:
+            print(f"⚠️ Regressão: {r['medicao']} p50 {r['base_p50_us']}µs -> {r['atual_p50_us']}µs (+{r['variacao']:.0%})", file=sys.stderr)
+        codigo = 1 if relatorio["regressoes"] else 0
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f: f.write(texto + "\n")
+    else:
+        print(texto)
+    sys.exit(codigo)
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,291 @@
+# =================================================================================
+# 🚦 TESTE DE CARGA PONTA A PONTA (APPLICATION REAL + SERVIÇOS LOCAIS)
+# =================================================================================
+# Sobe o Application de verdade (construir_aplicacao: handlers, JobQueue, updater horário) apontado para:
+#   - uma Bot API do Telegram local (BotAPIFake, via base_url do PTB)
+#   - uma football-data.org local (FootballDataFake, via CLIENTE_API.base_url)
+#   - um gspread em memória com latência por chamada
+# e injeta Updates sintéticos na update_queue, como o polling faria, simulando usuários que repetem o fluxo
+#   /stats -> c| -> STATUS|FUTURE| -> JOGO| -> STATS_FILTRO| ou RESULTADOS_FILTRO|
+# em patamares crescentes de usuários simultâneos. Reporta p50/p95/p99 por passo e o teto de vazão,
+# além do resultado do ciclo do updater que roda junto (ligas sincronizadas x adiadas, duração ou cancelamento).
+#
+# Uso:
+#   python benchmarks/carga.py --usuarios 1,5,10,25,50 --duracao 10 --saida carga.json
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from ambiente import importar_main
+main = importar_main("carga_bot_", silenciar_logs=False)
+from fakes import BotAPIFake, FootballDataFake, gerar_partidas_api, instalar_gspread_fake, planilha_sintetica
+
+TOKEN_FAKE = "123456:CARGA"
+PRIMEIRO_CHAT = 100_000
+
+class GeradorDeCarga:
+    """
+    Injeta Updates na update_queue do Application e mede o tempo até o fim do processamento.
+    O fim é marcado por um TypeHandler no grupo 1, que só roda depois do handler do grupo 0 (o do bot) terminar.
+    """
+    def __init__(self, app, timeout):
+        self.app = app
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pendentes = {}
+        self.erros_handler = 0
+        app.add_handler(TypeHandler(Update, self._concluir), group=1)
+        app.add_error_handler(self._registrar_erro)
+
+    async def _concluir(self, update, context):
+        futuro = self._pendentes.pop(update.update_id, None)
+        if futuro and not futuro.done(): futuro.set_result(None)
+
+    async def _registrar_erro(self, update, context):
+        self.erros_handler += 1
+        logging.debug(f"Erro no handler durante a carga: {context.error}")
+
+    def _usuario(self, chat_id):
+        return {"id": chat_id, "is_bot": False, "first_name": f"Carga {chat_id}"}
+
+    def _mensagem(self, chat_id, texto, do_bot=False):
+        return {"message_id": next(self._ids), "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+                "from": BotAPIFake.USUARIO_BOT if do_bot else self._usuario(chat_id), "text": texto}
+
+    def comando(self, chat_id, comando):
+        mensagem = self._mensagem(chat_id, comando)
+        mensagem["entities"] = [{"type": "bot_command", "offset": 0, "length": len(comando)}]
+        return {"update_id": next(self._ids), "message": mensagem}
+
+    def clique(self, chat_id, dados):
+        return {"update_id": next(self._ids), "callback_query": {
+            "id": str(next(self._ids)), "from": self._usuario(chat_id), "chat_instance": str(chat_id),
+            "data": dados, "message": self._mensagem(chat_id, "menu", do_bot=True),
+        }}
+
+    async def enviar(self, dados):
+        """Entrega o Update como o polling entregaria e retorna a latência (s) até o bot terminar de tratá-lo."""
+        update = Update.de_json(dados, self.app.bot)
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes[update.update_id] = futuro
+        inicio = time.perf_counter()
+        await self.app.update_queue.put(update)
+        try:
+            await asyncio.wait_for(futuro, self.timeout)
+        finally:
+            self._pendentes.pop(update.update_id, None)
+        return time.perf_counter() - inicio
+
+class MonitorAtualizacao:
+    """
+    Acompanha o ciclo do updater horário que roda durante a carga: envolve buscar_jogos e _atualizar_liga
+    do main para saber, por liga, se ela sincronizou, foi adiada (API sem resposta) ou falhou.
+    """
+    def __init__(self):
+        self.ligas = {} # aba_code -> "atualizada" | "adiada" | "erro"
+        self.tarefa = None
+        self.inicio = self.fim = None
+        buscar_jogos, atualizar_liga = main.buscar_jogos, main._atualizar_liga
+
+        async def buscar_jogos_monitorado(league_code, data_de=None):
+            partidas = await buscar_jogos(league_code, data_de=data_de)
+            self.ligas[league_code] = "adiada" if partidas is None else "atualizada"
+            return partidas
+
+        async def atualizar_liga_monitorada(aba_code, aba_config):
+            try:
+                return await atualizar_liga(aba_code, aba_config)
+            except Exception:
+                self.ligas[aba_code] = "erro"
+                raise
+
+        main.buscar_jogos, main._atualizar_liga = buscar_jogos_monitorado, atualizar_liga_monitorada
+
+    def iniciar(self):
+        self.inicio = time.monotonic()
+        self.tarefa = asyncio.create_task(main.atualizar_planilhas(None))
+        self.tarefa.add_done_callback(lambda _: setattr(self, "fim", time.monotonic()))
+
+    async def encerrar(self, aguardar):
+        """Espera o ciclo terminar (aguardar=True) ou o cancela; a cota da API pode fazê-lo passar da duração do teste."""
+        if self.tarefa is None or self.tarefa.done(): return
+        if aguardar:
+            print("🔄 Aguardando o fim do ciclo do updater...", file=sys.stderr)
+            await asyncio.wait([self.tarefa])
+            return
+        self.tarefa.cancel()
+        await asyncio.wait([self.tarefa])
+
+    def relatorio(self):
+        if self.tarefa is None: return {"status": "desativada"}
+        if self.tarefa.cancelled(): status = "cancelada"
+        elif self.tarefa.exception(): status = "erro"
+        else: status = "concluida"
+        por_resultado = lambda r: sorted(aba for aba, v in self.ligas.items() if v == r)
+        return {
+            "status": status,
+            "duracao_s": round((self.fim or time.monotonic()) - self.inicio, 2),
+            "ligas_atualizadas": por_resultado("atualizada"),
+            "ligas_adiadas": por_resultado("adiada"),
+            "ligas_com_erro": por_resultado("erro"),
+            "ligas_pendentes": sorted(aba for aba in main.LIGAS_MAP if aba not in self.ligas),
+        }
+
+async def usuario_virtual(gerador, indice, fim, amostras, contadores, jogos_por_liga):
+    """Repete o fluxo completo até o fim do patamar (o fluxo em andamento sempre termina)."""
+    chat_id = PRIMEIRO_CHAT + indice
+    rnd = random.Random(indice)
+    ligas = list(main.LIGAS_MAP)
+    while time.monotonic() < fim:
+        liga = rnd.choice(ligas)
+        idx_filtro = rnd.randrange(len(main.CONFRONTO_FILTROS))
+        tipo = main.CONFRONTO_FILTROS[idx_filtro][1]
+        passos = [
+            ("stats", gerador.comando(chat_id, "/stats")),
+            ("liga", gerador.clique(chat_id, f"c|{liga}")),
+            ("status_future", gerador.clique(chat_id, f"STATUS|FUTURE|{liga}")),
+            ("jogo", gerador.clique(chat_id, f"JOGO|{liga}|FUTURE|{rnd.randrange(jogos_por_liga)}")),
+            (tipo.lower(), gerador.clique(chat_id, f"{tipo}|{idx_filtro}")),
+        ]
+        for nome, dados in passos:
+            try:
+                amostras.setdefault(nome, []).append(await gerador.enviar(dados))
+                contadores["updates"] += 1
+            except asyncio.TimeoutError:
+                contadores["timeouts"] += 1
+                break # Fluxo quebrado: recomeça do /stats
+
+def _percentis(latencias):
+    ms = np.array(latencias) * 1000.0
+    return {"n": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 2), "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2), "max_ms": round(float(ms.max()), 2)}
+
+async def rodar_patamar(gerador, usuarios, duracao, jogos_por_liga):
+    amostras, contadores = {}, {"updates": 0, "timeouts": 0}
+    erros_antes = gerador.erros_handler
+    inicio = time.monotonic()
+    await asyncio.gather(*(usuario_virtual(gerador, i, inicio + duracao, amostras, contadores, jogos_por_liga) for i in range(usuarios)))
+    decorrido = time.monotonic() - inicio
+    passos = {nome: _percentis(lat) for nome, lat in amostras.items()}
+    return {
+        "usuarios": usuarios,
+        "duracao_s": round(decorrido, 2),
+        "updates": contadores["updates"],
+        "vazao_updates_s": round(contadores["updates"] / decorrido, 2),
+        "timeouts": contadores["timeouts"],
+        "erros_handler": gerador.erros_handler - erros_antes,
+        "p95_pior_passo_ms": max((p["p95_ms"] for p in passos.values()), default=None),
+        "passos": passos,
+    }
+
+async def executar(args):
+    telegram = BotAPIFake(args.latencia_telegram_ms / 1000).iniciar()
+    partidas = {liga: gerar_partidas_api(args.partidas_api, args.times, semente=i) for i, liga in enumerate(main.LIGAS_MAP)}
+    football_data = FootballDataFake(partidas, args.latencia_api_ms / 1000).iniciar()
+    main.CLIENTE_API.base_url = f"{football_data.url}/v4"
+    planilha = instalar_gspread_fake(planilha_sintetica(args.jogos, args.times, latencia=args.latencia_sheets_ms / 1000),
+                                     latencia=args.latencia_sheets_ms / 1000)
+
+    app = main.construir_aplicacao(TOKEN_FAKE, base_url=f"{telegram.url}/bot")
+    gerador = GeradorDeCarga(app, args.timeout)
+    atualizacao = MonitorAtualizacao()
+    await app.initialize()
+    await app.start()
+    try:
+        inicio = time.monotonic()
+        if args.sem_aquecimento: await main.iniciar_aquecimento(app) # Mede a carga logo após um deploy
+        else: await main.pre_carregar_cache_sheets()
+        aquecimento_s = round(time.monotonic() - inicio, 2)
+
+        # Um ciclo do updater horário roda junto com a carga (API + escritas no GSheets + refresh dos caches)
+        if not args.sem_atualizacao: atualizacao.iniciar()
+
+        # JOGO| só escolhe entre os primeiros jogos listados (o updater pode regravar as _FJ durante o teste)
+        jogos_por_liga = max(1, min(5, args.times // 2))
+        patamares = []
+        for usuarios in args.usuarios:
+            print(f"🚦 {usuarios} usuários simultâneos por {args.duracao}s...", file=sys.stderr)
+            resultado = await rodar_patamar(gerador, usuarios, args.duracao, jogos_por_liga)
+            print(f"   {resultado['vazao_updates_s']} updates/s | p95 pior passo {resultado['p95_pior_passo_ms']} ms"
+                  f" | timeouts {resultado['timeouts']} | erros {resultado['erros_handler']}", file=sys.stderr)
+            patamares.append(resultado)
+    finally:
+        await atualizacao.encerrar(args.aguardar_atualizacao)
+        await app.stop()
+        await main.encerrar_recursos(app)
+        await app.shutdown()
+        telegram.parar()
+        football_data.parar()
+
+    resultado_atualizacao = atualizacao.relatorio()
+    if resultado_atualizacao["status"] != "desativada":
+        print(f"🔄 Atualização {resultado_atualizacao['status']} em {resultado_atualizacao['duracao_s']}s"
+              f" | atualizadas {len(resultado_atualizacao['ligas_atualizadas'])}"
+              f" | adiadas {len(resultado_atualizacao['ligas_adiadas'])}"
+              f" | erros {len(resultado_atualizacao['ligas_com_erro'])}"
+              f" | pendentes {len(resultado_atualizacao['ligas_pendentes'])}", file=sys.stderr)
+    if resultado_atualizacao.get("ligas_adiadas") or resultado_atualizacao.get("ligas_com_erro"):
+        print(f"⚠️ Ligas não sincronizadas: {resultado_atualizacao['ligas_adiadas'] + resultado_atualizacao['ligas_com_erro']}", file=sys.stderr)
+
+    pico = max(patamares, key=lambda p: p["vazao_updates_s"])
+    saturado = next((p for p in patamares if p["timeouts"] or (p["p95_pior_passo_ms"] or 0) > args.slo_ms), None)
+    return {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "parametros": {k: v for k, v in vars(args).items() if k != "saida"},
+            "aquecimento_s": aquecimento_s,
+            "chamadas_telegram": telegram.chamadas,
+            "chamadas_football_data": football_data.chamadas,
+            "chamadas_gsheets": planilha.total_chamadas(),
+            "atualizacao": resultado_atualizacao,
+        },
+        "teto": {
+            "vazao_max_updates_s": pico["vazao_updates_s"],
+            "usuarios_no_pico": pico["usuarios"],
+            "slo_p95_ms": args.slo_ms,
+            "saturou_com_usuarios": saturado["usuarios"] if saturado else None,
+        },
+        "patamares": patamares,
+    }
+
+def main_carga():
+    parser = argparse.ArgumentParser(description="Teste de carga ponta a ponta do bot contra serviços locais.")
+    parser.add_argument("--usuarios", type=lambda s: [int(x) for x in s.split(",")], default=[1, 5, 10, 25, 50],
+                        help="Patamares de usuários simultâneos (ex.: 1,5,10,25,50)")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos por patamar")
+    parser.add_argument("--latencia-telegram-ms", type=float, default=30.0)
+    parser.add_argument("--latencia-api-ms", type=float, default=150.0)
+    parser.add_argument("--latencia-sheets-ms", type=float, default=200.0)
+    parser.add_argument("--jogos", type=int, default=2000, help="Jogos por aba de histórico")
+    parser.add_argument("--times", type=int, default=20, help="Times por liga")
+    parser.add_argument("--partidas-api", type=int, default=400, help="Partidas devolvidas por /matches")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p95 máximo aceito por passo")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Tempo máximo por Update antes de contar timeout")
+    parser.add_argument("--sem-aquecimento", action="store_true", help="Começa a carga sem esperar o pré-carregamento")
+    parser.add_argument("--sem-atualizacao", action="store_true", help="Não roda o ciclo do updater durante a carga")
+    parser.add_argument("--aguardar-atualizacao", action="store_true",
+                        help="Ao fim dos patamares, espera o ciclo do updater terminar em vez de cancelá-lo")
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING) # Logs INFO do bot por clique distorceriam a medição
+
+    relatorio = asyncio.run(executar(args))
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f: f.write(texto + "\n")
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main_carga()
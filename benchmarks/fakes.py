@@ -0,0 +1,287 @@
+# =================================================================================
+# 🧪 FAKES OFFLINE COMPARTILHADOS PELOS BENCHMARKS E PELO TESTE DE CARGA
+# =================================================================================
+# - Dados sintéticos: abas de histórico, abas _FJ e payloads de /matches da football-data.org
+# - gspread em memória com latência configurável (time.sleep, como o I/O bloqueante real)
+# - Servidores HTTP locais (stdlib asyncio) para a Bot API do Telegram e para a football-data.org
+import asyncio
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import main
+
+CABECALHO_HISTORICO = ["Mandante", "Visitante", "Gols Mandante", "Gols Visitante", "Gols Mandante 1T",
+                       "Gols Visitante 1T", "Gols Mandante 2T", "Gols Visitante 2T", "Data"]
+
+# =================================================================================
+# 🎲 DADOS SINTÉTICOS
+# =================================================================================
+def nomes_times(n_times, prefixo="Time"):
+    return [f"{prefixo} {i:03d}" for i in range(n_times)]
+
+def gerar_linhas(n_jogos, n_times, semente=42, prefixo="Time"):
+    """Linhas da aba de histórico (cabeçalho + n_jogos) como o gspread devolve em get_all_values."""
+    rnd = random.Random(semente)
+    times = nomes_times(n_times, prefixo)
+    inicio = date(2015, 1, 1)
+    linhas = [CABECALHO_HISTORICO]
+    for i in range(n_jogos):
+        mandante, visitante = rnd.sample(times, 2)
+        gm1, gv1 = rnd.randint(0, 2), rnd.randint(0, 2)
+        gm, gv = gm1 + rnd.randint(0, 3), gv1 + rnd.randint(0, 3)
+        dia = inicio + timedelta(days=i * 3650 // max(1, n_jogos))
+        linhas.append([mandante, visitante, str(gm), str(gv), str(gm1), str(gv1), str(gm - gm1), str(gv - gv1), dia.strftime("%d/%m/%Y")])
+    return linhas
+
+def gerar_linhas_fj(n_jogos, n_times, semente=3, prefixo="Time"):
+    """Linhas da aba _FJ: jogos agendados a partir de amanhã."""
+    rnd = random.Random(semente)
+    times = nomes_times(n_times, prefixo)
+    amanha = datetime.now(timezone.utc) + timedelta(days=1)
+    linhas = [list(main.CABECALHO_FJ)]
+    for i in range(n_jogos):
+        mandante, visitante = rnd.sample(times, 2)
+        linhas.append([mandante, visitante, (amanha + timedelta(hours=6 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"), str(i // 10 + 1)])
+    return linhas
+
+def gerar_partidas_api(n_jogos, n_times, semente=7, prefixo="Time"):
+    """Payload de /competitions/{liga}/matches: maioria FINISHED e uma rodada agendada."""
+    rnd = random.Random(semente)
+    times = nomes_times(n_times, prefixo)
+    agora = datetime.now(timezone.utc)
+    partidas = []
+    for i in range(n_jogos):
+        mandante, visitante = rnd.sample(times, 2)
+        agendado = i >= n_jogos - n_times // 2
+        data_jogo = agora + timedelta(days=(i - n_jogos + n_times // 2) // 10 + (1 if agendado else -1))
+        gm1, gv1 = rnd.randint(0, 2), rnd.randint(0, 2)
+        partidas.append({
+            "id": i, "status": "TIMED" if agendado else "FINISHED", "matchday": i // 10 + 1,
+            "utcDate": data_jogo.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "homeTeam": {"name": mandante}, "awayTeam": {"name": visitante},
+            "score": {
+                "fullTime": {"home": None if agendado else gm1 + rnd.randint(0, 3), "away": None if agendado else gv1 + rnd.randint(0, 3)},
+                "halfTime": {"home": None if agendado else gm1, "away": None if agendado else gv1},
+            },
+        })
+    return {"matches": partidas}
+
+# =================================================================================
+# 📄 GSPREAD EM MEMÓRIA
+# =================================================================================
+class AbaFake:
+    """Worksheet em memória. Cada chamada 'de rede' dorme 'latencia' segundos (bloqueante, como o gspread)."""
+    def __init__(self, titulo, linhas, latencia=0.0):
+        self.title = titulo
+        self.linhas = [list(l) for l in linhas]
+        self.latencia = latencia
+        self.row_count = len(self.linhas) + 100
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def _rede(self):
+        with self._lock: self.chamadas += 1
+        if self.latencia: time.sleep(self.latencia)
+
+    def get_all_values(self):
+        self._rede()
+        with self._lock: return [list(l) for l in self.linhas]
+
+    def get_all_records(self):
+        return main._registros_de_linhas(self.get_all_values())
+
+    def append_rows(self, linhas, **kwargs):
+        self._rede()
+        with self._lock: self.linhas.extend(list(map(str, l)) for l in linhas)
+
+    def batch_update(self, blocos, **kwargs):
+        self._rede()
+        with self._lock:
+            for bloco in blocos:
+                inicio = int(bloco['range'].split(':')[0][1:]) - 1
+                for i, valores in enumerate(bloco['values']):
+                    while len(self.linhas) <= inicio + i: self.linhas.append([])
+                    self.linhas[inicio + i] = ["" if v is None else str(v) for v in valores]
+            while self.linhas and not any(self.linhas[-1]): self.linhas.pop() # Como a API: linhas vazias no fim somem
+
+    def add_rows(self, n):
+        self._rede()
+        self.row_count += n
+
+class PlanilhaFake:
+    def __init__(self, abas, latencia=0.0):
+        self.abas = {a.title: a for a in abas}
+        self.latencia = latencia
+        self.chamadas = 0
+
+    def _rede(self):
+        self.chamadas += 1
+        if self.latencia: time.sleep(self.latencia)
+
+    def total_chamadas(self):
+        """Chamadas 'de rede' na planilha e em todas as abas."""
+        return self.chamadas + sum(a.chamadas for a in self.abas.values())
+
+    def worksheets(self):
+        self._rede()
+        return list(self.abas.values())
+
+    def worksheet(self, nome):
+        return self.abas[nome]
+
+    def values_batch_get(self, ranges, **kwargs):
+        self._rede()
+        faixas = []
+        for r in ranges:
+            aba = self.abas[r.strip("'")]
+            with aba._lock: faixas.append({"range": r, "values": [list(l) for l in aba.linhas]})
+        return {"valueRanges": faixas}
+
+class ClienteGSheetsFake:
+    def __init__(self, planilha): self.planilha = planilha
+    def open_by_url(self, url): return self.planilha
+
+def instalar_gspread_fake(abas, latencia=0.0):
+    """Substitui o cliente gspread do bot por uma planilha em memória e zera os handles abertos."""
+    planilha = PlanilhaFake(abas, latencia)
+    main.client = ClienteGSheetsFake(planilha)
+    main.PLANILHA._sh = None
+    main.PLANILHA._abas = {}
+    return planilha
+
+def planilha_sintetica(n_jogos, n_times, n_futuros=40, latencia=0.0):
+    """Uma aba de histórico e uma _FJ para cada liga do LIGAS_MAP (mesmos times em cada liga)."""
+    abas = []
+    for i, (aba_code, config) in enumerate(main.LIGAS_MAP.items()):
+        abas.append(AbaFake(config['sheet_past'], gerar_linhas(n_jogos, n_times, semente=i), latencia))
+        abas.append(AbaFake(config['sheet_future'], gerar_linhas_fj(n_futuros, n_times, semente=100 + i), latencia))
+    return abas
+
+# =================================================================================
+# 🌐 SERVIDORES HTTP LOCAIS (STDLIB ASYNCIO)
+# =================================================================================
+class ServidorHTTPFake:
+    """
+    Servidor HTTP/1.1 mínimo com keep-alive, rodando num event loop próprio em outra thread
+    (não disputa o loop do bot). As subclasses implementam rotear(metodo, caminho, query, corpo, headers)
+    -> (status, corpo_json, headers_extras). 'latencia' é aplicada a cada resposta.
+    """
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.porta = None
+        self.chamadas = {}
+        self._loop = asyncio.new_event_loop()
+        self._servidor = None
+        self._thread = None
+        self._conexoes = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.porta}"
+
+    def iniciar(self):
+        pronto = threading.Event()
+        def _rodar():
+            asyncio.set_event_loop(self._loop)
+            self._servidor = self._loop.run_until_complete(asyncio.start_server(self._atender, "127.0.0.1", 0))
+            self.porta = self._servidor.sockets[0].getsockname()[1]
+            pronto.set()
+            self._loop.run_forever()
+        self._thread = threading.Thread(target=_rodar, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        pronto.wait()
+        return self
+
+    def parar(self):
+        async def _encerrar():
+            self._servidor.close()
+            for writer in list(self._conexoes): writer.close() # readline() devolve EOF e cada conexão termina sozinha
+            pendentes = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            await asyncio.wait(pendentes, timeout=1) if pendentes else None
+        asyncio.run_coroutine_threadsafe(_encerrar(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+    def _contar(self, nome):
+        self.chamadas[nome] = self.chamadas.get(nome, 0) + 1
+
+    async def _atender(self, reader, writer):
+        self._conexoes.add(writer)
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha: break
+                metodo, alvo, _ = linha.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""): break
+                    chave, valor = h.decode("latin-1").split(":", 1)
+                    headers[chave.strip().lower()] = valor.strip()
+                corpo = await reader.readexactly(int(headers.get("content-length", 0)))
+                if self.latencia: await asyncio.sleep(self.latencia)
+
+                partes = urlsplit(alvo)
+                status, resposta, extras = self.rotear(metodo, partes.path, parse_qs(partes.query), corpo, headers)
+                dados = b"" if resposta is None else json.dumps(resposta).encode()
+                cabecalho = f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(dados)}\r\nConnection: keep-alive\r\n"
+                cabecalho += "".join(f"{k}: {v}\r\n" for k, v in (extras or {}).items())
+                writer.write(cabecalho.encode() + b"\r\n" + dados)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._conexoes.discard(writer)
+            writer.close()
+
+    def rotear(self, metodo, caminho, query, corpo, headers):
+        raise NotImplementedError
+
+class BotAPIFake(ServidorHTTPFake):
+    """
+    Bot API do Telegram em memória: responde getMe, sendMessage, editMessageText, answerCallbackQuery etc.
+    Use com ApplicationBuilder().base_url(f"{fake.url}/bot").
+    """
+    USUARIO_BOT = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                   "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+    def __init__(self, latencia=0.0):
+        super().__init__(latencia)
+        self._proxima_mensagem = 1
+
+    def _mensagem(self, params):
+        self._proxima_mensagem += 1
+        chat_id = int(params.get("chat_id", 0))
+        return {"message_id": int(params.get("message_id", self._proxima_mensagem)), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "from": self.USUARIO_BOT, "text": params.get("text", "")}
+
+    def rotear(self, metodo, caminho, query, corpo, headers):
+        metodo_api = caminho.rsplit("/", 1)[-1]
+        self._contar(metodo_api)
+        params = {k: v[0] for k, v in parse_qs(corpo.decode()).items()}
+        if metodo_api == "getMe": resultado = self.USUARIO_BOT
+        elif metodo_api in ("sendMessage", "editMessageText", "editMessageReplyMarkup"): resultado = self._mensagem(params)
+        else: resultado = True # answerCallbackQuery, deleteMessage, deleteWebhook...
+        return 200, {"ok": True, "result": resultado}, None
+
+class FootballDataFake(ServidorHTTPFake):
+    """football-data.org em memória: /v4/competitions/{liga}/matches com ETag/If-None-Match. Use em CLIENTE_API.base_url."""
+    def __init__(self, partidas_por_liga, latencia=0.0):
+        super().__init__(latencia)
+        self.partidas_por_liga = partidas_por_liga
+
+    def rotear(self, metodo, caminho, query, corpo, headers):
+        partes = caminho.strip("/").split("/")
+        if len(partes) != 4 or partes[1] != "competitions" or partes[3] != "matches":
+            self._contar("404")
+            return 404, {"message": "not found"}, None
+        liga = partes[2]
+        self._contar(liga)
+        etag = f'"{liga}-v1"'
+        if headers.get("if-none-match") == etag: return 304, None, {"ETag": etag}
+        return 200, self.partidas_por_liga.get(liga, {"matches": []}), {"ETag": etag}
@@ -0,0 +1,131 @@
+# =================================================================================
+# 🔍 VERIFICAÇÃO DOS ÍNDICES DE ESTATÍSTICAS (CONTRA UMA VARREDURA SIMPLES)
+# =================================================================================
+# As janelas (últimos N, casa/fora, intervalo de datas) saem das somas acumuladas por time de
+# materializar_estatisticas, e o confronto direto sai do índice de pares (confronto_chaves/inicio).
+# A aritmética de índices é sutil (inicio_visoes, visoes_casa/inicio_casa, corte dos últimos N em
+# casa/fora, busca da chave do par), então este script compara, em casos aleatórios, o resultado de
+# calcular_estatisticas_time e calcular_estatisticas_confronto com uma varredura linha a linha do histórico.
+#
+# Uso:
+#   python benchmarks/verificar_indices.py               -> sai com código 1 se algum caso divergir
+#   python benchmarks/verificar_indices.py --casos 20000 --semente 7
+import argparse
+import random
+import sys
+
+import numpy as np
+from ambiente import importar_main
+main = importar_main("verif_bot_")
+from fakes import gerar_linhas
+
+# (jogos, times): liga pequena, média e uma com muitos jogos por data (empates no corte por data)
+LIGAS = [(300, 8), (2_000, 20), (6_000, 120)]
+
+def carregar_liga(n_jogos, n_times, semente):
+    linhas = gerar_linhas(n_jogos, n_times, semente=semente)
+    historico = main.HistoricoLiga([main.Jogo.de_registro(dict(zip(linhas[0], l))) for l in linhas[1:]])
+    main.materializar_estatisticas(historico)
+    return historico
+
+def _estatisticas_das_posicoes(historico, time, posicoes):
+    """Mesmo formato de calcular_estatisticas_time, somando só as posições dadas."""
+    pos = np.array(posicoes, dtype=np.intp)
+    em_casa = np.array([historico.jogos[p].mandante == time for p in posicoes], dtype=bool)
+    jogos_casa, jogos_fora, somas_casa, somas_fora = main._somar_metricas(
+        np.zeros(len(pos), dtype=np.intp), 1,
+        historico.gm[pos], historico.gv[pos], historico.gm1[pos], historico.gv1[pos], em_casa
+    )
+    return main._montar_estatisticas(time, jogos_casa[0], jogos_fora[0], somas_casa[0], somas_fora[0])
+
+def varredura_time(historico, time, casa_fora, ultimos, desde, ate):
+    """Referência: percorre todos os jogos em ordem cronológica e aplica o filtro à mão."""
+    posicoes = []
+    for p, jogo in enumerate(historico.jogos):
+        if casa_fora == "casa" and jogo.mandante != time: continue
+        if casa_fora == "fora" and jogo.visitante != time: continue
+        if casa_fora is None and time not in (jogo.mandante, jogo.visitante): continue
+        if desde is not None and jogo.data < desde: continue
+        if ate is not None and jogo.data > ate: continue
+        posicoes.append(p)
+    if ultimos: posicoes = posicoes[-ultimos:]
+    return _estatisticas_das_posicoes(historico, time, posicoes)
+
+def _caso_aleatorio(rnd, historico):
+    time = rnd.choice(historico.times + ["Time Inexistente"])
+    casa_fora = rnd.choice([None, "casa", "fora"])
+    ultimos = rnd.choice([None, 1, 5, 10, 20, 10_000])
+    primeira, ultima = int(historico.data[0]), int(historico.data[-1])
+    desde = rnd.choice([None, rnd.randint(primeira - 30, ultima + 30)])
+    ate = rnd.choice([None, rnd.randint(primeira - 30, ultima + 30)])
+    return time, casa_fora, ultimos, desde, ate
+
+def verificar_janelas(historico, rnd, casos):
+    """Somas acumuladas (e o caminho sem materialização) x varredura. Retorna a lista de divergências."""
+    divergencias = []
+    for _ in range(casos):
+        time, casa_fora, ultimos, desde, ate = _caso_aleatorio(rnd, historico)
+        esperado = varredura_time(historico, time, casa_fora, ultimos, desde, ate)
+        materializado = main.calcular_estatisticas_time(time, "PL", ultimos, casa_fora, historico, desde, ate)
+
+        acumulado, historico.acumulado = historico.acumulado, None # Força o caminho pelo índice de posições
+        try: sem_materializar = main.calcular_estatisticas_time(time, "PL", ultimos, casa_fora, historico, desde, ate)
+        finally: historico.acumulado = acumulado
+
+        for caminho, obtido in (("acumulado", materializado), ("posicoes", sem_materializar)):
+            if obtido != esperado:
+                divergencias.append(f"janela[{caminho}] time={time} casa_fora={casa_fora} ultimos={ultimos} desde={desde} ate={ate}")
+    return divergencias
+
+def varredura_confronto(historico, mandante, visitante, ultimos, desde, ate):
+    """Referência do confronto direto: jogos entre os dois times (qualquer mando), na visão do mandante."""
+    posicoes = [
+        p for p, jogo in enumerate(historico.jogos)
+        if {jogo.mandante, jogo.visitante} == {mandante, visitante}
+        and (desde is None or jogo.data >= desde) and (ate is None or jogo.data <= ate)
+    ]
+    if ultimos: posicoes = posicoes[-ultimos:]
+    d = _estatisticas_das_posicoes(historico, mandante, posicoes)
+    saldos = [
+        (j.gm - j.gv) if j.mandante == mandante else (j.gv - j.gm)
+        for j in (historico.jogos[p] for p in posicoes)
+    ]
+    d["vitorias"], d["empates"], d["derrotas"] = sum(s > 0 for s in saldos), sum(s == 0 for s in saldos), sum(s < 0 for s in saldos)
+    return posicoes, d
+
+def verificar_confrontos(historico, rnd, casos):
+    """Índice de pares x varredura (posições e estatísticas). Retorna a lista de divergências."""
+    divergencias = []
+    for _ in range(casos):
+        _, _, ultimos, desde, ate = _caso_aleatorio(rnd, historico)
+        mandante, visitante = rnd.sample(historico.times + ["Time Inexistente"], 2)
+        esperadas, esperado = varredura_confronto(historico, mandante, visitante, ultimos, desde, ate)
+        obtidas = historico.posicoes_confronto(mandante, visitante, ultimos, desde, ate).tolist()
+        obtido = main.calcular_estatisticas_confronto(mandante, visitante, historico, ultimos, desde, ate)
+        if obtidas != esperadas or obtido != esperado:
+            divergencias.append(f"confronto {mandante} x {visitante} ultimos={ultimos} desde={desde} ate={ate}")
+    return divergencias
+
+def main_verificacao():
+    parser = argparse.ArgumentParser(description="Confere os índices de estatísticas contra uma varredura simples.")
+    parser.add_argument("--casos", type=int, default=3000, help="Casos aleatórios por liga")
+    parser.add_argument("--semente", type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semente)
+    divergencias = []
+    for n_jogos, n_times in LIGAS:
+        historico = carregar_liga(n_jogos, n_times, semente=rnd.randrange(10**6))
+        janelas = verificar_janelas(historico, rnd, args.casos)
+        confrontos = verificar_confrontos(historico, rnd, args.casos)
+        print(
+            f"🔍 Liga {n_jogos} jogos / {n_times} times: {args.casos} janelas ({len(janelas)} divergências), "
+            f"{args.casos} confrontos ({len(confrontos)} divergências)", file=sys.stderr
+        )
+        divergencias += janelas + confrontos
+
+    for d in divergencias[:20]: print(f"❌ {d}", file=sys.stderr)
+    sys.exit(1 if divergencias else 0)
+
+if __name__ == "__main__":
+    main_verificacao()
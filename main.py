@@ -10,25 +10,40 @@ import os
 import tempfile
 import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
-import nest_asyncio
+from datetime import date, datetime, timedelta, timezone
 import sys # Necessário para o sys.exit
+import threading
+import time
+import itertools
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import sqlite3
+import httpx
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, ContextTypes, JobQueue 
-from telegram.error import BadRequest
-from gspread.exceptions import WorksheetNotFound
+from telegram.ext import ApplicationBuilder, BaseUpdateProcessor, CommandHandler, CallbackQueryHandler, ContextTypes, JobQueue 
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from gspread.exceptions import WorksheetNotFound, APIError
+from oauth2client.client import AccessTokenRefreshError
+from google.auth.exceptions import GoogleAuthError
 
 # Configuração de Logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
-nest_asyncio.apply()
+logging.getLogger("httpx").setLevel(logging.WARNING) # Evita um log INFO por requisição HTTP
 
 # ===== Variáveis de Configuração (LIDAS DE VARIÁVEIS DE AMBIENTE) =====
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "SEU_TOKEN_AQUI") 
 API_KEY = os.environ.get("API_KEY", "SUA_API_KEY_AQUI")
 SHEET_URL = os.environ.get("SHEET_URL", "https://docs.google.com/spreadsheets/d/1ChFFXQxo1qQElNzh2OC8-UPgofRXxyVWN06ExBQ3YqY/edit?usp=drivesdk")
+DB_PATH = os.environ.get("DB_PATH", "historico.db") # Espelho SQLite local do histórico
+SYNC_MARGEM_DIAS = 3 # Margem antes da marca d'água (resultados confirmados com atraso pela API)
+FUTURE_JANELA_DIAS = 90 # Horizonte dos próximos jogos gravados nas abas _FJ
 
 # Mapeamento de Ligas
 LIGAS_MAP = {
@@ -46,31 +61,67 @@ LIGAS_MAP = {
 ABAS_PASSADO = list(LIGAS_MAP.keys())
 
 ULTIMOS = 10
-SHEET_CACHE = {}
-CACHE_DURATION_SECONDS = 3600 # 1 hora
+# Janelas selecionáveis no menu de filtros: (rótulo, últimos N jogos ou None = temporada atual)
+JANELAS = [("5", 5), ("10", 10), ("20", 20), ("Temporada", None)]
+JANELA_PADRAO = next(i for i, (_, n) in enumerate(JANELAS) if n == ULTIMOS)
+MAX_RESULTADOS_LISTADOS = 20 # Teto da lista de resultados da temporada (a mensagem do Telegram tem limite)
+LIGAS_ANO_CIVIL = {"BSA"} # Temporada de janeiro a dezembro; nas demais, de julho a junho
+CACHE_DURATION_SECONDS = 3600 # 1 hora (após isso a entrada é servida vencida enquanto é recarregada)
+SHEET_CACHE_MAX_ENTRADAS = int(os.environ.get("SHEET_CACHE_MAX_ENTRADAS", "64"))
+SHEET_CACHE_MAX_BYTES = int(os.environ.get("SHEET_CACHE_MAX_BYTES", str(256 * 1024 * 1024))) # 256 MB
+TEXTO_CACHE_MAX_ENTRADAS = int(os.environ.get("TEXTO_CACHE_MAX_ENTRADAS", "2048")) # Mensagens de confronto já renderizadas
 MAX_GAMES_LISTED = 30
+SHEETS_MAX_WORKERS = int(os.environ.get("SHEETS_MAX_WORKERS", "4")) # Threads para I/O bloqueante do gspread
+SHEETS_WORKERS_USUARIO = int(os.environ.get("SHEETS_WORKERS_USUARIO", "2")) # Threads só para cache miss com usuário esperando
 
-# Filtros reutilizáveis para Estatísticas e Resultados
+# Filtros reutilizáveis para Estatísticas e Resultados (a janela - últimos N ou temporada - é escolhida no menu)
 CONFRONTO_FILTROS = [
-    # Label | Tipo no callback | Últimos | Condição Mandante | Condição Visitante
-    (f"📊 Estatísticas | ÚLTIMOS {ULTIMOS} GERAL", "STATS_FILTRO", ULTIMOS, None, None),
-    (f"📊 Estatísticas | {ULTIMOS} (M CASA vs V FORA)", "STATS_FILTRO", ULTIMOS, "casa", "fora"),
-    (f"📅 Resultados | ÚLTIMOS {ULTIMOS} GERAL", "RESULTADOS_FILTRO", ULTIMOS, None, None),
-    (f"📅 Resultados | {ULTIMOS} (M CASA vs V FORA)", "RESULTADOS_FILTRO", ULTIMOS, "casa", "fora"),
+    # Label ({janela} = janela escolhida) | Tipo no callback | Condição Mandante | Condição Visitante
+    ("📊 Estatísticas | {janela} GERAL", "STATS_FILTRO", None, None),
+    ("📊 Estatísticas | {janela} (M CASA vs V FORA)", "STATS_FILTRO", "casa", "fora"),
+    ("📅 Resultados | {janela} GERAL", "RESULTADOS_FILTRO", None, None),
+    ("📅 Resultados | {janela} (M CASA vs V FORA)", "RESULTADOS_FILTRO", "casa", "fora"),
+    ("⚔️ Confronto Direto (H2H) | {janela}", "H2H_FILTRO", None, None),
 ]
 
 LIVE_STATUSES = ["IN_PLAY", "HALF_TIME", "PAUSED"]
 
+# Cota da football-data.org (plano gratuito: 10/min). Uma requisição de folga evita estourar a janela da API.
+API_REQUISICOES_POR_MINUTO = int(os.environ.get("API_REQUISICOES_POR_MINUTO", "9"))
+API_RAJADA = int(os.environ.get("API_RAJADA", "1")) # Requisições permitidas em sequência antes de aplicar o ritmo
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://api.football-data.org/v4")
+API_MAX_CONEXOES = int(os.environ.get("API_MAX_CONEXOES", "4")) # Conexões keep-alive / requisições simultâneas
+API_TIMEOUT_SEGUNDOS = 10
+# Ligas do updater em paralelo: só as que a cota atende dentro de um prazo de requisição (o resto só esperaria na fila)
+MAX_LIGAS_CONCORRENTES = (int(os.environ.get("MAX_LIGAS_CONCORRENTES", "0"))
+                          or max(1, API_RAJADA + API_REQUISICOES_POR_MINUTO * API_TIMEOUT_SEGUNDOS // 60))
+API_PRAZO_LIVE_SEGUNDOS = 5 # Prazo total do AO VIVO (usuário esperando na tela)
+LIVE_POLL_SEGUNDOS = int(os.environ.get("LIVE_POLL_SEGUNDOS", "30")) # Intervalo do poller de placares ao vivo
+LIVE_FRACAO_COTA = float(os.environ.get("LIVE_FRACAO_COTA", "0.5")) # Parte da cota da API que o poller pode usar
+# Ligas consultadas por rodada do poller; com mais ligas ativas que isso, elas se revezam (round-robin)
+LIVE_LIGAS_POR_RODADA = max(1, int(API_REQUISICOES_POR_MINUTO * LIVE_FRACAO_COTA * LIVE_POLL_SEGUNDOS / 60))
+LIVE_CACHE_TTL_SEGUNDOS = 60 # Idade máxima do snapshot AO VIVO antes de uma nova consulta sob demanda
+LIVE_JANELA_MINUTOS = 150 # Um jogo é considerado "em andamento" até 2h30 após o horário de início
+TELEGRAM_EDICOES_POR_SEGUNDO = int(os.environ.get("TELEGRAM_EDICOES_POR_SEGUNDO", "25")) # Orçamento de fan-out
+TELEGRAM_LOTE_EDICOES = 25 # Edições de mensagens disparadas juntas em cada lote
+TELEGRAM_PAUSA_REDE_SEGUNDOS = 5 # Após timeout/erro de rede numa edição, espera antes de tentar de novo
+METRICAS_PORTA = int(os.environ.get("METRICAS_PORTA", "9464")) # Endpoint Prometheus (0 desativa)
+METRICAS_HOST = os.environ.get("METRICAS_HOST", "127.0.0.1") # Só local por padrão
+UPDATES_SIMULTANEOS = int(os.environ.get("UPDATES_SIMULTANEOS", "32")) # Updates de chats diferentes tratados ao mesmo tempo
+ADMIN_IDS = {int(i) for i in os.environ.get("ADMIN_IDS", "").split(",") if i.strip().isdigit()} # IDs do Telegram que podem usar /metrics
+
 # =================================================================================
 # ✅ CONEXÃO GSHEETS VIA VARIÁVEL DE AMBIENTE 
 # =================================================================================
 
 CREDS_JSON = os.environ.get("GSPREAD_CREDS_JSON")
-client = None
 
-if not CREDS_JSON:
-    logging.error("❌ ERRO DE AUTORIZAÇÃO GSHEET: Variável GSPREAD_CREDS_JSON não encontrada. Configure-a no Railway.")
-else:
+def autorizar_gsheets():
+    """Autoriza o cliente gspread a partir de GSPREAD_CREDS_JSON. Retorna None em caso de falha."""
+    if not CREDS_JSON:
+        logging.error("❌ ERRO DE AUTORIZAÇÃO GSHEET: Variável GSPREAD_CREDS_JSON não encontrada. Configure-a no Railway.")
+        return None
+
     try:
         # Usa um arquivo temporário para carregar as credenciais
         with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding='utf-8') as tmp_file:
@@ -79,14 +130,280 @@ else:
         
         scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
         creds = ServiceAccountCredentials.from_json_keyfile_name(tmp_file_path, scope)
-        client = gspread.authorize(creds)
+        novo_client = gspread.authorize(creds)
       
         logging.info("✅ Conexão GSheets estabelecida via Variável de Ambiente.")
         os.remove(tmp_file_path) # Limpa o arquivo temporário
+        return novo_client
 
     except Exception as e:
         logging.error(f"❌ ERRO DE AUTORIZAÇÃO GSHEET: Erro ao carregar ou autorizar credenciais JSON: {e}")
-        client = None
+        return None
+
+client = autorizar_gsheets()
+
+def _erro_de_conexao(e):
+    """True para erros de autenticação ou transporte, que justificam reautorizar e reabrir a planilha."""
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                      AccessTokenRefreshError, GoogleAuthError)):
+        return True
+    if isinstance(e, APIError):
+        status = getattr(getattr(e, 'response', None), 'status_code', None)
+        return status in (401, 403)
+    return False
+
+class GerenciadorPlanilha:
+    """
+    Mantém a Spreadsheet e as Worksheets abertas durante toda a vida do bot.
+    Só reautoriza e reabre em erros de autenticação/transporte (evita 1-2 chamadas de metadados por leitura).
+    """
+    def __init__(self, url):
+        self.url = url
+        self._sh = None
+        self._abas = {}
+        self._lock = threading.Lock()
+
+    def planilha(self):
+        with self._lock:
+            if self._sh is None:
+                if not client: raise Exception("Cliente GSheets não autorizado.")
+                sh = client.open_by_url(self.url)
+                # Uma única chamada de metadados já traz todas as abas (LIGAS_MAP e _FJ)
+                self._abas = {ws.title: ws for ws in sh.worksheets()}
+                self._sh = sh
+            return self._sh
+
+    def worksheet(self, nome):
+        """Retorna a Worksheet pelo nome (levanta WorksheetNotFound se a aba não existir)."""
+        sh = self.planilha()
+        with self._lock:
+            ws = self._abas.get(nome)
+        if ws is None:
+            ws = sh.worksheet(nome)
+            with self._lock: self._abas[nome] = ws
+        return ws
+
+    def reconectar(self):
+        """Descarta os handles, reautoriza o cliente e força a reabertura na próxima chamada."""
+        global client
+        with self._lock:
+            self._sh = None
+            self._abas = {}
+            novo_client = autorizar_gsheets()
+            if novo_client: client = novo_client
+
+    def executar(self, nome_aba, operacao, repetir=True):
+        """
+        Executa operacao(worksheet); em erro de auth/transporte reconecta e tenta mais uma vez.
+        Escritas não idempotentes (append_rows) usam repetir=False: um timeout pode ter gravado mesmo assim,
+        então só reconecta e repassa o erro.
+        """
+        try:
+            return _contar_gsheets(operacao, self.worksheet(nome_aba))
+        except Exception as e:
+            if not _erro_de_conexao(e): raise
+            logging.warning(f"Conexão GSheets perdida ao acessar '{nome_aba}' ({e}). Reconectando...")
+            self.reconectar()
+            if not repetir: raise
+            return _contar_gsheets(operacao, self.worksheet(nome_aba))
+
+    def ler_abas(self, nomes):
+        """
+        Lê várias abas inteiras com UMA chamada values_batch_get. Retorna {nome: linhas (como get_all_values)}.
+        Abas inexistentes são ignoradas (um range inválido derrubaria o lote inteiro).
+        """
+        def _ler():
+            sh = self.planilha() # Handle local: um reconectar() concorrente pode zerar self._sh
+            with self._lock: existentes = [n for n in nomes if n in self._abas]
+            if not existentes: return {}
+            resposta = _contar_gsheets(sh.values_batch_get, [f"'{n}'" for n in existentes])
+            return {n: _completar_linhas(faixa.get('values', [])) for n, faixa in zip(existentes, resposta.get('valueRanges', []))}
+        try:
+            return _ler()
+        except Exception as e:
+            if not _erro_de_conexao(e): raise
+            logging.warning(f"Conexão GSheets perdida na leitura em lote ({e}). Reconectando...")
+            self.reconectar()
+            return _ler()
+
+def _completar_linhas(linhas):
+    """A API omite as células vazias no fim de cada linha; completa até a largura da maior linha, como get_all_values."""
+    largura = max(map(len, linhas), default=0)
+    return [linha + [""] * (largura - len(linha)) for linha in linhas]
+
+def _contar_gsheets(operacao, *args):
+    """Executa uma chamada ao GSheets contando o resultado (ok, código HTTP do APIError, conexao ou erro)."""
+    try:
+        resultado = operacao(*args)
+    except Exception as e:
+        if isinstance(e, APIError) and getattr(e, 'response', None) is not None: status = str(e.response.status_code)
+        else: status = "conexao" if _erro_de_conexao(e) else "erro"
+        TELEMETRIA.incrementar("bot_upstream_requisicoes_total", servico="gsheets", resultado=status)
+        raise
+    TELEMETRIA.incrementar("bot_upstream_requisicoes_total", servico="gsheets", resultado="ok")
+    return resultado
+
+PLANILHA = GerenciadorPlanilha(SHEET_URL)
+
+# =================================================================================
+# 📊 TELEMETRIA (HISTOGRAMAS + CONTADORES NO FORMATO TEXTO DO PROMETHEUS)
+# =================================================================================
+class Telemetria:
+    """
+    Registro de métricas em memória, seguro entre threads (o pool do GSheets também registra).
+    Histogramas de latência em segundos e contadores com rótulos; 'coletores' leem valores
+    que já existem em outros objetos (ex.: contadores dos caches) só na hora da exportação.
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descricoes = {} # nome -> (tipo, ajuda)
+        self._contadores = {} # (nome, rótulos) -> valor
+        self._histogramas = {} # (nome, rótulos) -> [contagem por bucket..., soma, total]
+        self._coletores = []
+
+    def registrar(self, nome, tipo, ajuda):
+        self._descricoes[nome] = (tipo, ajuda)
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock: self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, segundos, **rotulos):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            serie = self._histogramas.get(chave)
+            if serie is None: serie = self._histogramas[chave] = [0] * (len(self.BUCKETS) + 2)
+            for i, limite in enumerate(self.BUCKETS):
+                if segundos <= limite:
+                    serie[i] += 1
+                    break
+            serie[-2] += segundos
+            serie[-1] += 1
+
+    @contextmanager
+    def medir(self, nome, **rotulos):
+        inicio = time.monotonic()
+        try: yield
+        finally: self.observar(nome, time.monotonic() - inicio, **rotulos)
+
+    def cronometrar(self, nome, **rotulos):
+        """Decorador: registra a duração de cada chamada (funções normais ou corrotinas) em 'nome'."""
+        def decorador(funcao):
+            if asyncio.iscoroutinefunction(funcao):
+                @wraps(funcao)
+                async def envoltorio_async(*args, **kwargs):
+                    with self.medir(nome, funcao=funcao.__name__, **rotulos): return await funcao(*args, **kwargs)
+                return envoltorio_async
+            @wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                with self.medir(nome, funcao=funcao.__name__, **rotulos): return funcao(*args, **kwargs)
+            return envoltorio
+        return decorador
+
+    def coletor(self, funcao):
+        """'funcao()' devolve [(nome, rótulos, valor)] de métricas já registradas; lida a cada exportação."""
+        self._coletores.append(funcao)
+        return funcao
+
+    @staticmethod
+    def _rotulos(rotulos, extra=()):
+        pares = list(rotulos) + list(extra)
+        if not pares: return ""
+        return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pares) + "}"
+
+    def _series(self):
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {k: list(v) for k, v in self._histogramas.items()}
+        for coletor in self._coletores:
+            try:
+                for nome, rotulos, valor in coletor():
+                    contadores[(nome, tuple(sorted(rotulos.items())))] = valor
+            except Exception as e:
+                logging.error(f"Erro no coletor de métricas {coletor.__name__}: {e}")
+        return contadores, histogramas
+
+    def texto_prometheus(self):
+        """Exportação no formato texto 0.0.4 do Prometheus."""
+        contadores, histogramas = self._series()
+        linhas = []
+        for nome, (tipo, ajuda) in sorted(self._descricoes.items()):
+            linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+            if tipo == "histogram":
+                for (n, rotulos), serie in sorted(histogramas.items()):
+                    if n != nome: continue
+                    acumulado = 0
+                    for limite, qtd in zip(self.BUCKETS, serie):
+                        acumulado += qtd
+                        linhas.append(f"{nome}_bucket{self._rotulos(rotulos, [('le', limite)])} {acumulado}")
+                    linhas.append(f"{nome}_bucket{self._rotulos(rotulos, [('le', '+Inf')])} {serie[-1]}")
+                    linhas.append(f"{nome}_sum{self._rotulos(rotulos)} {serie[-2]:.6f}")
+                    linhas.append(f"{nome}_count{self._rotulos(rotulos)} {serie[-1]}")
+            else:
+                for (n, rotulos), valor in sorted(contadores.items()):
+                    if n == nome: linhas.append(f"{nome}{self._rotulos(rotulos)} {valor}")
+        return "\n".join(linhas) + "\n"
+
+    def _quantil(self, serie, q):
+        """Quantil aproximado pelo limite superior do bucket (como histogram_quantile, sem interpolação)."""
+        alvo, acumulado = q * serie[-1], 0
+        for limite, qtd in zip(self.BUCKETS, serie):
+            acumulado += qtd
+            if acumulado >= alvo: return limite
+        return float('inf')
+
+    def resumo(self):
+        """Texto curto para o comando /metrics: latências (n, média, p95) e contadores."""
+        contadores, histogramas = self._series()
+        linhas = ["⏱️ Latências (n | média | p95≤)"]
+        for (nome, rotulos), serie in sorted(histogramas.items()):
+            if not serie[-1]: continue
+            rotulo = ",".join(f"{k}={v}" for k, v in rotulos)
+            linhas.append(f"{nome.removeprefix('bot_')}[{rotulo}]: {serie[-1]} | {serie[-2] / serie[-1] * 1000:.0f}ms | {self._quantil(serie, 0.95) * 1000:.0f}ms")
+        linhas.append("\n🔢 Contadores")
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            rotulo = ",".join(f"{k}={v}" for k, v in rotulos)
+            linhas.append(f"{nome.removeprefix('bot_')}[{rotulo}]: {valor:g}")
+        return "\n".join(linhas)
+
+TELEMETRIA = Telemetria()
+TELEMETRIA.registrar("bot_callback_segundos", "histogram", "Latência do callback_query_handler por prefixo do callback_data.")
+TELEMETRIA.registrar("bot_funcao_segundos", "histogram", "Latência das leituras de dados (cache/GSheets) e das consultas à football-data.org.")
+TELEMETRIA.registrar("bot_job_segundos", "histogram", "Duração de cada ciclo dos jobs do JobQueue.")
+TELEMETRIA.registrar("bot_atualizacao_etapa_segundos", "histogram", "Duração de cada etapa do updater por liga.")
+TELEMETRIA.registrar("bot_upstream_requisicoes_total", "counter", "Requisições aos serviços externos por resultado (ok, 304, 429, erro...).")
+TELEMETRIA.registrar("bot_cache_eventos_total", "counter", "Eventos dos caches em memória (hits, stale_hits, misses, refreshes...).")
+TELEMETRIA.registrar("bot_cache_entradas", "gauge", "Entradas atualmente em cada cache.")
+TELEMETRIA.registrar("bot_cache_bytes", "gauge", "Tamanho estimado em memória de cada cache.")
+
+def iniciar_servidor_metricas(porta, host=METRICAS_HOST):
+    """Serve TELEMETRIA.texto_prometheus() em http://host:porta/metrics numa thread própria (porta 0 desativa)."""
+    if not porta: return None
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            corpo = TELEMETRIA.texto_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args): pass # Um scrape a cada poucos segundos não deve poluir o log
+
+    try:
+        servidor = ThreadingHTTPServer((host, porta), _Handler)
+    except OSError as e:
+        logging.error(f"Não foi possível abrir o endpoint de métricas em {host}:{porta}: {e}")
+        return None
+    threading.Thread(target=servidor.serve_forever, name="Metricas", daemon=True).start()
+    logging.info(f"📊 Métricas Prometheus em http://{host}:{porta}/metrics")
+    return servidor
 
 # =================================================================================
 # 💾 FUNÇÕES DE SUPORTE E CACHING 
@@ -106,48 +423,397 @@ def escape_markdown(text):
     # Escapa *, _, [ e ] que são os caracteres mais problemáticos
     return str(text).replace('*', '\\*').replace('_', '\\_').replace('[', '\\[') .replace(']', '\\]')
 
-def get_sheet_data(aba_code):
-    """Obtém dados da aba de histórico (sheet_past) com cache."""
-    global SHEET_CACHE
-    agora = datetime.now()
+class CacheSWR:
+    """
+    Cache LRU com stale-while-revalidate, limitado por número de entradas e bytes estimados.
+    Entradas vencidas continuam sendo servidas enquanto uma tarefa no pool do GSheets busca a versão nova,
+    então nenhuma requisição de usuário espera por um refresh. Só o primeiro acesso (miss) precisa buscar.
+    """
+    def __init__(self, nome, carregar, ttl=CACHE_DURATION_SECONDS, max_entradas=SHEET_CACHE_MAX_ENTRADAS, max_bytes=SHEET_CACHE_MAX_BYTES):
+        self.nome = nome
+        self.carregar = carregar # Função BLOQUEANTE chave -> dados (roda no pool)
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict() # chave -> {'data', 'timestamp', 'bytes'}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.contadores = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_erros": 0, "evictions": 0}
+
+    def __contains__(self, chave):
+        with self._lock: return chave in self._entradas
+
+    def obter(self, chave):
+        """Retorna os dados (mesmo vencidos) ou None em caso de miss. Entradas vencidas disparam revalidação em segundo plano."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.contadores["misses"] += 1
+                return None
+            self._entradas.move_to_end(chave)
+            vencida = (time.monotonic() - entrada['timestamp']) >= self.ttl
+            self.contadores["stale_hits" if vencida else "hits"] += 1
+        if vencida: self.revalidar(chave)
+        return entrada['data']
+
+    def guardar(self, chave, dados):
+        tamanho = _estimar_bytes(dados)
+        with self._lock:
+            antiga = self._entradas.pop(chave, None)
+            if antiga: self._bytes -= antiga['bytes']
+            self._entradas[chave] = {'data': dados, 'timestamp': time.monotonic(), 'bytes': tamanho}
+            self._bytes += tamanho
+            # Evicção LRU (mantém sempre ao menos a entrada recém-inserida)
+            while len(self._entradas) > 1 and (len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes):
+                _, removida = self._entradas.popitem(last=False)
+                self._bytes -= removida['bytes']
+                self.contadores["evictions"] += 1
+
+    def marcar_obsoleto(self, chave):
+        """Marca a entrada como vencida e já agenda o refresh; até ele terminar, a versão antiga continua sendo servida."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None: return
+            entrada['timestamp'] = float('-inf')
+        self.revalidar(chave)
+
+    def recarregar(self, chave):
+        """Busca a chave (BLOQUEANTE), guarda no cache e retorna os dados. Levanta a exceção do carregador."""
+        try:
+            dados = self.carregar(chave)
+        except Exception as e:
+            with self._lock: self.contadores["refresh_erros"] += 1
+            logging.error(f"Erro ao recarregar '{chave}' no cache {self.nome}: {e}")
+            raise
+        self.guardar(chave, dados)
+        with self._lock: self.contadores["refreshes"] += 1
+        return dados
+
+    def revalidar(self, chave, prioritario=False):
+        """Agenda recarregar(chave) no pool (uma busca por chave em andamento) e retorna o Future."""
+        return _submeter_leitura((self.nome, chave), self.recarregar, chave, prioritario=prioritario)
+
+    def reservar(self, chave):
+        """Registra a busca da chave no single-flight sem agendá-la: quem reservou executa com _rodar_leitura."""
+        return _submeter_leitura((self.nome, chave), self.recarregar, chave, agendar=False)
+
+    def estatisticas(self):
+        with self._lock:
+            return dict(self.contadores, entradas=len(self._entradas), bytes=self._bytes)
+
+def _estimar_bytes(dados, amostra=50):
+    """Estimativa barata do tamanho em memória de uma lista de linhas (mede uma amostra e extrapola)."""
+    if isinstance(dados, HistoricoLiga):
+        return dados.bytes_estimados()
+    if not isinstance(dados, list) or not dados:
+        return sys.getsizeof(dados)
+    itens = dados[:amostra]
+    total_amostra = 0
+    for item in itens:
+        total_amostra += sys.getsizeof(item)
+        if isinstance(item, dict):
+            total_amostra += sum(sys.getsizeof(v) for v in item.values())
+    return sys.getsizeof(dados) + (total_amostra * len(dados)) // len(itens)
+
+_VERSOES_HISTORICO = itertools.count(1)
+
+def _data_ordinal(data_str):
+    """'dd/mm/YYYY' -> ordinal do dia (date.toordinal); 0 se a data for inválida."""
+    try: return datetime.strptime(str(data_str), "%d/%m/%Y").toordinal()
+    except ValueError: return 0
+
+class Jogo:
+    """Registro compacto de um jogo do histórico: gols já convertidos para int e data como ordinal."""
+    __slots__ = ("mandante", "visitante", "gm", "gv", "gm1", "gv1", "data")
+
+    def __init__(self, mandante, visitante, gm, gv, gm1, gv1, data):
+        self.mandante = mandante
+        self.visitante = visitante
+        self.gm = gm
+        self.gv = gv
+        self.gm1 = gm1
+        self.gv1 = gv1
+        self.data = data
+
+    @classmethod
+    def de_registro(cls, r):
+        """Converte uma linha de get_all_records() (uma única vez, na carga da aba)."""
+        return cls(
+            sys.intern(str(r.get('Mandante', ''))), sys.intern(str(r.get('Visitante', ''))), # Nomes compartilhados entre jogos
+            safe_int(r.get('Gols Mandante')), safe_int(r.get('Gols Visitante')),
+            safe_int(r.get('Gols Mandante 1T')), safe_int(r.get('Gols Visitante 1T')),
+            _data_ordinal(r.get('Data', ''))
+        )
 
-    aba_name = LIGAS_MAP[aba_code]['sheet_past']
+    @property
+    def data_str(self):
+        return date.fromordinal(self.data).strftime("%d/%m/%Y") if self.data else "??/??/????"
 
-    if aba_name in SHEET_CACHE:
-        cache_tempo = SHEET_CACHE[aba_name]['timestamp']
-        if (agora - cache_tempo).total_seconds() < CACHE_DURATION_SECONDS:
-            return SHEET_CACHE[aba_name]['data']
+class HistoricoLiga:
+    """
+    Histórico de uma liga em ordem cronológica (registros Jogo), guardado também em colunas NumPy
+    (id do mandante/visitante, gols FT/1T e data ordinal) + índice time -> posições dos jogos (casa, fora e todos).
+    Construído uma vez por carga da aba; 'versao' muda a cada nova carga.
+    """
+    def __init__(self, jogos):
+        self.versao = next(_VERSOES_HISTORICO)
+        self.jogos = sorted(jogos, key=lambda j: j.data) # sort estável: empates mantêm a ordem da planilha
+
+        self.times = sorted({j.mandante for j in self.jogos} | {j.visitante for j in self.jogos})
+        self.id_time = {time: i for i, time in enumerate(self.times)}
+
+        n = len(self.jogos)
+        self.mandante = np.fromiter((self.id_time[j.mandante] for j in self.jogos), dtype=np.int32, count=n)
+        self.visitante = np.fromiter((self.id_time[j.visitante] for j in self.jogos), dtype=np.int32, count=n)
+        self.gm = np.fromiter((j.gm for j in self.jogos), dtype=np.int32, count=n)
+        self.gv = np.fromiter((j.gv for j in self.jogos), dtype=np.int32, count=n)
+        self.gm1 = np.fromiter((j.gm1 for j in self.jogos), dtype=np.int32, count=n)
+        self.gv1 = np.fromiter((j.gv1 for j in self.jogos), dtype=np.int32, count=n)
+        self.data = np.fromiter((j.data for j in self.jogos), dtype=np.int32, count=n)
+
+        self.indice = {}
+        indice = {}
+        for pos in range(n):
+            mandante, visitante = self.mandante[pos], self.visitante[pos]
+            self._posicoes_time(indice, mandante)["casa"].append(pos)
+            self._posicoes_time(indice, visitante)["fora"].append(pos)
+            self._posicoes_time(indice, mandante)[None].append(pos)
+            if visitante != mandante: self._posicoes_time(indice, visitante)[None].append(pos)
+        for id_time, posicoes in indice.items():
+            self.indice[self.times[id_time]] = {k: np.array(v, dtype=np.intp) for k, v in posicoes.items()}
+
+        # Confrontos diretos: par não ordenado de times -> posições dos jogos entre eles, em formato CSR
+        # (chave do par ordenada + início de cada par em confronto_posicoes). O argsort estável mantém a ordem cronológica.
+        par = (np.minimum(self.mandante, self.visitante).astype(np.int64) * len(self.times)
+               + np.maximum(self.mandante, self.visitante))
+        self.confronto_posicoes = np.argsort(par, kind='stable').astype(np.intp)
+        self.confronto_chaves, inicio = np.unique(par[self.confronto_posicoes], return_index=True)
+        self.confronto_inicio = np.append(inicio, n).astype(np.intp)
+
+        # Somas acumuladas por time (preenchidas por materializar_estatisticas). Cada jogo vira uma "visão" por time,
+        # ordenadas por (time, data); acumulado[:, i] = soma das visões [0, i), linhas jogos_casa|jogos_fora|somas_casa|somas_fora.
+        # Qualquer janela contígua de um time (últimos N, intervalo de datas) é uma subtração de duas linhas.
+        self.acumulado = None
+        self.inicio_visoes = None # id do time -> primeira visão do time (len(times) + 1 posições)
+        self.data_visoes = None
+        self.visoes_casa = self.inicio_casa = None # Visões em casa (índices globais) agrupadas por time
+        self.visoes_fora = self.inicio_fora = None
+
+    @staticmethod
+    def _posicoes_time(indice, id_time):
+        posicoes = indice.get(id_time)
+        if posicoes is None:
+            posicoes = indice[id_time] = {"casa": [], "fora": [], None: []}
+        return posicoes
+
+    def posicoes(self, time, casa_fora=None, ultimos=None, desde=None, ate=None):
+        """Posições (cronológicas) dos jogos do time com o filtro casa/fora, entre as datas ordinais 'desde' e 'ate' (inclusive)."""
+        posicoes = self.indice.get(time)
+        if posicoes is None: return np.empty(0, dtype=np.intp)
+        return self._recortar(posicoes[casa_fora], ultimos, desde, ate)
+
+    def posicoes_confronto(self, time_a, time_b, ultimos=None, desde=None, ate=None):
+        """Posições (cronológicas) dos jogos entre os dois times, com qualquer mando, direto do índice de pares."""
+        id_a, id_b = self.id_time.get(time_a), self.id_time.get(time_b)
+        if id_a is None or id_b is None: return np.empty(0, dtype=np.intp)
+        chave = min(id_a, id_b) * len(self.times) + max(id_a, id_b)
+        i = int(np.searchsorted(self.confronto_chaves, chave))
+        if i == len(self.confronto_chaves) or self.confronto_chaves[i] != chave: return np.empty(0, dtype=np.intp)
+        posicoes = self.confronto_posicoes[self.confronto_inicio[i]:self.confronto_inicio[i + 1]]
+        return self._recortar(posicoes, ultimos, desde, ate)
+
+    def _recortar(self, posicoes, ultimos=None, desde=None, ate=None):
+        """Aplica a janela (datas ordinais inclusivas e/ou últimos N) a posições em ordem cronológica."""
+        if desde is not None or ate is not None:
+            datas = self.data[posicoes]
+            inicio = np.searchsorted(datas, desde, 'left') if desde is not None else 0
+            fim = np.searchsorted(datas, ate, 'right') if ate is not None else len(posicoes)
+            posicoes = posicoes[inicio:fim]
+        return posicoes[-ultimos:] if ultimos else posicoes
+
+    def jogos_time(self, time, casa_fora=None, ultimos=None, desde=None, ate=None):
+        return [self.jogos[p] for p in self.posicoes(time, casa_fora, ultimos, desde, ate)]
+
+    def estatisticas_janela(self, time, casa_fora=None, ultimos=None, desde=None, ate=None):
+        """
+        Linha [jogos_casa, jogos_fora, somas_casa..., somas_fora...] do time na janela pedida, a partir das somas
+        acumuladas: O(1) por métrica (+ busca binária nas datas). None se a liga não foi materializada.
+        """
+        if self.acumulado is None: return None
+        id_time = self.id_time.get(time)
+        if id_time is None: return np.zeros(self.acumulado.shape[0], dtype=self.acumulado.dtype)
+
+        inicio, fim = int(self.inicio_visoes[id_time]), int(self.inicio_visoes[id_time + 1])
+        if desde is not None or ate is not None:
+            datas = self.data_visoes[inicio:fim]
+            if ate is not None: fim = inicio + int(np.searchsorted(datas, ate, 'right'))
+            if desde is not None: inicio += int(np.searchsorted(datas, desde, 'left'))
+        if ultimos and casa_fora is None:
+            inicio = max(inicio, fim - ultimos)
+        elif ultimos:
+            # Últimos N jogos em casa (ou fora): a janela começa na N-ésima visão em casa mais recente dentro do intervalo
+            visoes, limites = (self.visoes_casa, self.inicio_casa) if casa_fora == "casa" else (self.visoes_fora, self.inicio_fora)
+            proprias = visoes[limites[id_time]:limites[id_time + 1]]
+            a, b = np.searchsorted(proprias, inicio, 'left'), np.searchsorted(proprias, fim, 'left')
+            if b - a > ultimos: inicio = int(proprias[b - ultimos])
+
+        linha = self.acumulado[:, max(fim, inicio)] - self.acumulado[:, inicio]
+        # Com filtro casa/fora, só as colunas daquele mando contam
+        k = (len(linha) - 2) // 2
+        if casa_fora == "casa": linha[1], linha[2 + k:] = 0, 0
+        elif casa_fora == "fora": linha[0], linha[2:2 + k] = 0, 0
+        return linha
+
+    def bytes_estimados(self):
+        if not self.jogos: return sys.getsizeof(self.jogos)
+        colunas = (self.mandante, self.visitante, self.gm, self.gv, self.gm1, self.gv1, self.data)
+        return (sys.getsizeof(self.jogos) + len(self.jogos) * sys.getsizeof(self.jogos[0])
+                + sum(c.nbytes for c in colunas)
+                + sum(p.nbytes for posicoes in self.indice.values() for p in posicoes.values())
+                + self.confronto_posicoes.nbytes + self.confronto_chaves.nbytes + self.confronto_inicio.nbytes
+                + sum(a.nbytes for a in (self.acumulado, self.inicio_visoes, self.data_visoes, self.visoes_casa,
+                                         self.inicio_casa, self.visoes_fora, self.inicio_fora) if a is not None)
+                + sum(sys.getsizeof(t) for t in self.times))
+
+    def __len__(self):
+        return len(self.jogos)
 
-    if not client: raise Exception("Cliente GSheets não autorizado.")
-    
-    try:
-        sh = client.open_by_url(SHEET_URL)
-        linhas = sh.worksheet(aba_name).get_all_records()
-    except Exception as e:
-        if aba_name in SHEET_CACHE: return SHEET_CACHE[aba_name]['data']
-        raise e
+# =================================================================================
+# 🗄️ ESPELHO LOCAL DO HISTÓRICO (SQLITE) - CAMINHO PRINCIPAL DE LEITURA
+# =================================================================================
+class EspelhoHistorico:
+    """
+    Cópia local em SQLite das abas sheet_past, alimentada pelo atualizar_planilhas junto com a planilha.
+    O histórico é lido daqui (disco/page cache local); o GSheets só é consultado para semear uma liga vazia.
+    """
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS jogos (
+            id INTEGER PRIMARY KEY,
+            liga TEXT NOT NULL,
+            mandante TEXT NOT NULL,
+            visitante TEXT NOT NULL,
+            gols_mandante INTEGER NOT NULL,
+            gols_visitante INTEGER NOT NULL,
+            gols_mandante_1t INTEGER NOT NULL,
+            gols_visitante_1t INTEGER NOT NULL,
+            data INTEGER NOT NULL, -- date.toordinal()
+            UNIQUE (liga, mandante, visitante, data)
+        );
+        CREATE INDEX IF NOT EXISTS idx_jogos_mandante ON jogos (liga, mandante, data);
+        CREATE INDEX IF NOT EXISTS idx_jogos_visitante ON jogos (liga, visitante, data);
+        CREATE TABLE IF NOT EXISTS sincronizacao (
+            liga TEXT PRIMARY KEY,
+            ultima_data INTEGER NOT NULL, -- marca d'água: data do último jogo finalizado sincronizado
+            atualizado_em TEXT NOT NULL
+        );
+    """
 
-    SHEET_CACHE[aba_name] = { 'data': linhas, 'timestamp': agora }
-    return linhas
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._conexao = None # Aberta no primeiro uso: importar o módulo não cria nem abre o banco
+        self._lock = threading.Lock()
+
+    @property
+    def _conn(self):
+        """Conexão SQLite, aberta (com o esquema criado) no primeiro acesso. Usar com _lock adquirido."""
+        if self._conexao is None:
+            conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+            with conexao:
+                conexao.execute("PRAGMA journal_mode=WAL")
+                conexao.executescript(self.ESQUEMA)
+            self._conexao = conexao
+        return self._conexao
+
+    def total_jogos(self, liga):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jogos WHERE liga = ?", (liga,)).fetchone()[0]
+
+    def inserir(self, liga, jogos):
+        """Insere os jogos ignorando duplicados (liga, mandante, visitante, data). Retorna só os realmente novos."""
+        novos = []
+        with self._lock, self._conn:
+            for j in jogos:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO jogos (liga, mandante, visitante, gols_mandante, gols_visitante,"
+                    " gols_mandante_1t, gols_visitante_1t, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (liga, j.mandante, j.visitante, j.gm, j.gv, j.gm1, j.gv1, j.data)
+                )
+                if cur.rowcount: novos.append(j)
+        return novos
+
+    def carregar(self, liga):
+        """Todos os jogos da liga em ordem cronológica (empates na ordem de inserção = ordem da planilha)."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT mandante, visitante, gols_mandante, gols_visitante, gols_mandante_1t, gols_visitante_1t, data"
+                " FROM jogos WHERE liga = ? ORDER BY data, id", (liga,)
+            ).fetchall()
+        return [Jogo(sys.intern(m), sys.intern(v), gm, gv, gm1, gv1, d) for m, v, gm, gv, gm1, gv1, d in linhas]
+
+    def filtrar_novos(self, liga, registros):
+        """Registros (dicts no formato da planilha) que ainda não estão no espelho, sem duplicados entre si."""
+        novos, vistos = [], set()
+        with self._lock:
+            for r in registros:
+                chave = (r["Mandante"], r["Visitante"], _data_ordinal(r["Data"]))
+                if chave in vistos: continue
+                vistos.add(chave)
+                existe = self._conn.execute(
+                    "SELECT 1 FROM jogos WHERE liga = ? AND mandante = ? AND visitante = ? AND data = ?", (liga, *chave)
+                ).fetchone()
+                if not existe: novos.append(r)
+        return novos
+
+    def marca_dagua(self, liga):
+        """Data (ordinal) do último jogo sincronizado da liga; sem registro, usa o jogo mais recente do espelho."""
+        with self._lock:
+            linha = self._conn.execute("SELECT ultima_data FROM sincronizacao WHERE liga = ?", (liga,)).fetchone()
+            if linha is None:
+                linha = self._conn.execute("SELECT MAX(data) FROM jogos WHERE liga = ?", (liga,)).fetchone()
+        return linha[0] if linha else None
+
+    def salvar_marca_dagua(self, liga, data_ordinal):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sincronizacao (liga, ultima_data, atualizado_em) VALUES (?, ?, ?)"
+                " ON CONFLICT (liga) DO UPDATE SET ultima_data = MAX(ultima_data, excluded.ultima_data),"
+                " atualizado_em = excluded.atualizado_em",
+                (liga, data_ordinal, datetime.now(timezone.utc).isoformat())
+            )
 
-def get_sheet_data_future(aba_code):
-    """Obtém dados da aba de cache de jogos futuros (sheet_future)."""
+ESPELHO = EspelhoHistorico(DB_PATH)
 
-    aba_name = LIGAS_MAP[aba_code]['sheet_future']
-    if not client: return []
+def _registros_de_linhas(linhas):
+    """Linhas cruas (cabeçalho + dados) no formato de get_all_records: lista de dicts por coluna."""
+    if not linhas: return []
+    cabecalho = linhas[0]
+    return [dict(zip(cabecalho, linha + [""] * (len(cabecalho) - len(linha)))) for linha in linhas[1:]]
 
-    try:
-        sh = client.open_by_url(SHEET_URL)
-        linhas_raw = sh.worksheet(aba_name).get_all_values()
-    except Exception as e:
-        logging.error(f"Erro ao buscar cache de futuros jogos em {aba_name}: {e}")
-        return []
+def _buscar_historico(aba_name, registros=None):
+    """
+    Carrega o histórico do espelho SQLite; se a liga ainda não foi espelhada, semeia a partir da planilha
+    ('registros' já lidos em lote evitam a chamada individual).
+    """
+    jogos = ESPELHO.carregar(aba_name)
+    if not jogos:
+        if registros is None:
+            if not client: raise Exception("Cliente GSheets não autorizado.") # Só a semeadura depende da planilha
+            registros = PLANILHA.executar(aba_name, lambda ws: ws.get_all_records())
+        jogos = [Jogo.de_registro(r) for r in registros]
+        ESPELHO.inserir(aba_name, jogos)
+        logging.info(f"🗄️ Espelho SQLite de {aba_name} semeado com {len(jogos)} jogos da planilha.")
+    historico = HistoricoLiga(jogos)
+    # Última etapa da carga (roda no pool, inclusive no refresh disparado pelo updater horário):
+    # deixa as estatísticas de todos os times prontas para os filtros do menu
+    materializar_estatisticas(historico)
+    return historico
+
+def _buscar_futuros(aba_name, linhas_raw=None):
+    if linhas_raw is None: linhas_raw = PLANILHA.executar(aba_name, lambda ws: ws.get_all_values())
 
     # CORREÇÃO DO ERRO DE SINTAXE NA LINHA 149
-    if not linhas_raw or len(linhas_raw) <= 1:
-        return []
-
-    data_rows = linhas_raw[1:]
+    # Linhas vindas da API crua perdem as células vazias do fim (ex.: Matchday nulo no mata-mata da CL)
+    data_rows = _completar_linhas(linhas_raw)[1:] if linhas_raw else []
 
     jogos = []
     for row in data_rows:
@@ -156,94 +822,371 @@ def get_sheet_data_future(aba_code):
                 "Mandante_Nome": row[0],
                 "Visitante_Nome": row[1],
                 "Data_Hora": row[2],
+                "Data_UTC": parse_data_hora_utc(row[2]), # Parseado uma vez, reaproveitado pelos handlers
                 "Matchday": safe_int(row[3])
             })
-
     return jogos
 
+SHEET_CACHE = CacheSWR("historico", _buscar_historico)
+FUTURE_CACHE = CacheSWR("futuros", _buscar_futuros) # Abas _FJ já parseadas (revalidado pelo atualizar_planilhas)
+
+@TELEMETRIA.cronometrar("bot_funcao_segundos")
+def get_sheet_data(aba_code):
+    """Obtém o HistoricoLiga da aba de histórico (sheet_past) com cache. BLOQUEANTE: use get_sheet_data_async nos handlers."""
+    aba_name = LIGAS_MAP[aba_code]['sheet_past']
+
+    historico = SHEET_CACHE.obter(aba_name)
+    if historico is not None: return historico
+    return SHEET_CACHE.recarregar(aba_name)
+
+def parse_data_hora_utc(data_str):
+    """Converte 'YYYY-MM-DDTHH:MM...' (utcDate da API) em datetime UTC naive, ou None se inválido."""
+    try: return datetime.strptime(str(data_str)[:16], '%Y-%m-%dT%H:%M')
+    except ValueError: return None
+
+def carregar_em_lote(abas_historico=(), abas_futuros=()):
+    """
+    (BLOQUEANTE) Carrega várias ligas de uma vez: todas as abas que precisam da planilha (_FJ e históricos
+    ainda não espelhados no SQLite) vêm numa única leitura em lote; o resto sai do espelho local.
+    Retorna {aba: erro} das abas que não puderam ser carregadas.
+    """
+    erros = {}
+    def _carregar_historico(aba, linhas_planilha=None):
+        registros = _registros_de_linhas(linhas_planilha) if linhas_planilha is not None else None
+        historico = _buscar_historico(aba, registros)
+        SHEET_CACHE.guardar(aba, historico)
+        logging.info(f"✅ Liga {aba} pronta.")
+        return historico
+
+    def _falhar(erro): raise erro
+
+    def _executar(aba, func, *args):
+        # Se um clique já adiantou esta liga no pool do usuário, a carga dela é pulada aqui
+        if _rodar_leitura(reservas[aba], func, *args) and reservas[aba].exception(): erros[aba] = reservas[aba].exception()
+
+    # Cada liga entra no single-flight: um clique durante o aquecimento aguarda esta carga (ou a adianta, se ainda não começou)
+    reservas = {aba: SHEET_CACHE.reservar(aba) for aba in abas_historico}
+    try:
+        # Ligas já espelhadas ficam prontas antes mesmo da leitura da planilha
+        sem_espelho = [aba for aba in abas_historico if ESPELHO.total_jogos(aba) == 0]
+        for aba in abas_historico:
+            if aba not in sem_espelho: _executar(aba, _carregar_historico, aba)
+
+        if not client: # Sem planilha: só o espelho local é carregado
+            erro = Exception("Cliente GSheets não autorizado.")
+            for aba in sem_espelho: _executar(aba, _falhar, erro)
+            return dict(erros, **dict.fromkeys(abas_futuros, erro))
+        linhas = PLANILHA.ler_abas(sem_espelho + list(abas_futuros)) if (sem_espelho or abas_futuros) else {}
+        for aba in sem_espelho:
+            if aba in linhas: _executar(aba, _carregar_historico, aba, linhas[aba])
+            else: _executar(aba, _falhar, WorksheetNotFound(aba))
+        for aba in abas_futuros:
+            if aba in linhas: FUTURE_CACHE.guardar(aba, _buscar_futuros(aba, linhas[aba]))
+            else: erros[aba] = WorksheetNotFound(aba)
+        return erros
+    except Exception as e:
+        # Falha na leitura em lote: quem aguarda uma liga ainda não carregada recebe o erro em vez de esperar para sempre
+        for aba in reservas: _executar(aba, _falhar, e)
+        raise
+
+# =================================================================================
+# ⚡ ACESSO NÃO-BLOQUEANTE AO GSHEETS (POOL DE THREADS + SINGLE-FLIGHT)
+# =================================================================================
+# Todo I/O do gspread é bloqueante: roda num pool limitado para não travar o event loop.
+SHEETS_EXECUTOR = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="gsheets")
+# Pool separado para cache miss com usuário esperando: não entra na fila do aquecimento nem das escritas do updater.
+SHEETS_EXECUTOR_USUARIO = ThreadPoolExecutor(max_workers=SHEETS_WORKERS_USUARIO, thread_name_prefix="gsheets-usuario")
+
+# Leituras em andamento por aba: chats simultâneos com cache miss (e o aquecimento) compartilham a mesma busca.
+_LEITURAS_EM_VOO = {}
+_LEITURAS_LOCK = threading.Lock()
+
+def _liberar_leitura(chave, fut):
+    with _LEITURAS_LOCK:
+        if _LEITURAS_EM_VOO.get(chave) is fut:
+            del _LEITURAS_EM_VOO[chave]
+
+def _rodar_leitura(fut, func, *args):
+    """Executa a leitura e resolve o Future, se ninguém a pegou antes (ela pode estar nas duas filas). True se executou."""
+    with _LEITURAS_LOCK:
+        if fut.running() or fut.done(): return False
+        fut.set_running_or_notify_cancel()
+    try: fut.set_result(func(*args))
+    except BaseException as e: fut.set_exception(e)
+    return True
+
+def _submeter_leitura(chave, func, *args, prioritario=False, agendar=True):
+    """
+    Agenda func no pool do GSheets. Se já houver uma leitura com a mesma chave, reaproveita o Future dela;
+    se o pedido é prioritário e ela ainda está na fila, agenda também no pool do usuário (quem pegar primeiro executa).
+    agendar=False só registra a leitura: o chamador a executa com _rodar_leitura.
+    """
+    with _LEITURAS_LOCK:
+        fut = _LEITURAS_EM_VOO.get(chave)
+        if fut is None:
+            fut = _LEITURAS_EM_VOO[chave] = Future()
+            fut.prioritario = False
+            fut.add_done_callback(lambda f: _liberar_leitura(chave, f))
+            if agendar and not prioritario: SHEETS_EXECUTOR.submit(_rodar_leitura, fut, func, *args)
+        if prioritario and not fut.prioritario and not (fut.running() or fut.done()):
+            fut.prioritario = True
+            SHEETS_EXECUTOR_USUARIO.submit(_rodar_leitura, fut, func, *args)
+    return fut
+
+async def _aguardar(fut):
+    """Aguarda um Future do pool sem que o cancelamento de um chat cancele a busca compartilhada."""
+    return await asyncio.shield(asyncio.wrap_future(fut))
+
+async def _executar_sheets(func, *args):
+    """Executa uma chamada gspread qualquer (ex: escrita do updater) no pool, sem deduplicação."""
+    return await _aguardar(SHEETS_EXECUTOR.submit(func, *args))
+
+@TELEMETRIA.cronometrar("bot_funcao_segundos")
+async def get_sheet_data_async(aba_code):
+    """Versão não-bloqueante de get_sheet_data: cache hit responde direto, miss vai para o pool (uma busca por aba)."""
+    aba_name = LIGAS_MAP[aba_code]['sheet_past']
+    historico = SHEET_CACHE.obter(aba_name)
+    if historico is not None: return historico
+    return await _aguardar(SHEET_CACHE.revalidar(aba_name, prioritario=True))
+
+@TELEMETRIA.cronometrar("bot_funcao_segundos")
+async def get_sheet_data_future_async(aba_code):
+    """Jogos futuros (sheet_future) já parseados: cache hit responde da memória, miss vai para o pool."""
+    aba_name = LIGAS_MAP[aba_code]['sheet_future']
+    jogos = FUTURE_CACHE.obter(aba_name)
+    if jogos is not None: return jogos
+    if not client: return []
+    try:
+        return await _aguardar(FUTURE_CACHE.revalidar(aba_name, prioritario=True))
+    except Exception as e:
+        logging.error(f"Erro ao buscar cache de futuros jogos em {aba_name}: {e}")
+        return []
+
 async def pre_carregar_cache_sheets():
-    """Pré-carrega o histórico de todas as ligas (rodado uma vez na inicialização)."""
+    """Pré-carrega histórico e jogos futuros de todas as ligas com uma leitura em lote (rodado na inicialização)."""
     if not client:
-        logging.warning("Pré-carregamento de cache ignorado: Conexão GSheets falhou.")
-        return
+        logging.warning("Conexão GSheets falhou: pré-carregando só as ligas já espelhadas no SQLite.")
 
     logging.info("Iniciando pré-carregamento de cache...")
-    for aba in ABAS_PASSADO:
-        try:
-            get_sheet_data(aba)
-            logging.info(f"Cache de histórico para {aba} pré-carregado.")
-        except Exception as e:
-            logging.warning(f"Não foi possível pré-carregar cache para {aba}: {e}")
-        await asyncio.sleep(1)
+    inicio = time.monotonic()
+    abas_historico = [LIGAS_MAP[aba]['sheet_past'] for aba in ABAS_PASSADO]
+    abas_futuros = [LIGAS_MAP[aba]['sheet_future'] for aba in ABAS_PASSADO]
+    try:
+        erros = await _executar_sheets(carregar_em_lote, abas_historico, abas_futuros)
+    except Exception as e:
+        logging.warning(f"Não foi possível pré-carregar o cache: {e}")
+        return
+    for aba, e in erros.items():
+        logging.warning(f"Não foi possível pré-carregar cache para {aba}: {e}")
+    logging.info(f"Cache de {len(abas_historico) + len(abas_futuros) - len(erros)} abas pré-carregado em {time.monotonic() - inicio:.1f}s.")
 
 # =================================================================================
 # 🎯 FUNÇÕES DE API E ATUALIZAÇÃO 
 # =================================================================================
-def buscar_jogos(league_code, status_filter):
-    """Busca jogos na API com filtro de status (usado para FINISHED e ALL)."""
-  
-    try:
-        url = f"https://api.football-data.org/v4/competitions/{league_code}/matches"
+class LimitadorTaxa:
+    """
+    Token bucket assíncrono que modela a cota da football-data.org (requisições por minuto).
+    Todas as chamadas à API passam por aqui, então o updater pode rodar várias ligas em paralelo sem estourar o limite.
+    Duas filas FIFO: a prioritária (AO VIVO, usuário esperando) é sempre atendida antes da normal (updater em lote).
+    """
+    def __init__(self, por_minuto, rajada=1):
+        self.taxa = por_minuto / 60.0 # tokens por segundo
+        self.capacidade = max(1, rajada)
+        self._tokens = float(self.capacidade)
+        self._ultimo = time.monotonic()
+        self._filas = (deque(), deque()) # (prioritária, normal): futures de quem aguarda cota
+        self._despachante = None
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    async def adquirir(self, prioritario=False):
+        """Aguarda até haver cota disponível e consome uma requisição."""
+        futuro = asyncio.get_running_loop().create_future()
+        self._filas[0 if prioritario else 1].append(futuro)
+        self._acordar()
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled(): self._tokens += 1 # Cota concedida e não usada: devolve
+            raise
+
+    def _acordar(self):
+        loop = asyncio.get_running_loop()
+        if self._despachante is None or self._despachante.done() or self._despachante.get_loop() is not loop:
+            self._despachante = loop.create_task(self._despachar())
+
+    async def _despachar(self):
+        """Libera uma requisição por token, sempre da fila prioritária primeiro. Nenhum lock fica preso durante a espera."""
+        while True:
+            for fila in self._filas:
+                while fila and fila[0].done(): fila.popleft() # Desistiu (cancelada) enquanto aguardava
+            fila = next((f for f in self._filas if f), None)
+            if fila is None: return
+            self._repor()
+            if self._tokens < 1:
+                # Reavalia depois da espera: um pedido prioritário pode ter chegado nesse meio-tempo
+                await asyncio.sleep((1 - self._tokens) / self.taxa)
+                continue
+            self._tokens -= 1
+            fila.popleft().set_result(None)
 
-        if status_filter != "ALL":
-             url += f"?status={status_filter}"
+    def pausar(self, segundos):
+        """Após um 429 da API: nenhuma nova requisição sai antes de 'segundos'."""
+        self._repor()
+        self._tokens = min(self._tokens, 1 - segundos * self.taxa)
 
-        r = requests.get(
-            url,
-            headers={"X-Auth-Token": API_KEY}, timeout=10
-        )
+LIMITADOR_API = LimitadorTaxa(API_REQUISICOES_POR_MINUTO, API_RAJADA)
+
+class ClienteAPI:
+    """
+    Cliente HTTP assíncrono compartilhado da football-data.org: conexões keep-alive reaproveitadas (sem novo
+    handshake TCP+TLS por chamada), no máximo API_MAX_CONEXOES requisições simultâneas, cota do LIMITADOR_API
+    e prazo por requisição HTTP (sem contar a espera pela cota), para uma API lenta nunca travar os outros chats.
+    """
+    def __init__(self, base_url, token, max_conexoes, timeout):
+        self.base_url = base_url
+        self.token = token
+        self.max_conexoes = max_conexoes
+        self.timeout = timeout
+        self._cliente = None
+        self._limite = None
+
+    def _obter_cliente(self):
+        # Criado sob demanda para ficar ligado ao event loop do Application
+        if self._cliente is None or self._cliente.is_closed:
+            self._cliente = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"X-Auth-Token": self.token},
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_conexoes, max_keepalive_connections=self.max_conexoes),
+            )
+            self._limite = asyncio.Semaphore(self.max_conexoes)
+        return self._cliente
+
+    async def _requisitar(self, caminho, params, headers):
+        cliente = self._obter_cliente()
+        async with self._limite:
+            r = await cliente.get(caminho, params=params, headers=headers)
+        if r.status_code == 304: return r # Resposta condicional: conteúdo inalterado
+        if r.status_code == 429:
+            # A API informa em quantos segundos o contador de requisições zera
+            LIMITADOR_API.pausar(safe_int(r.headers.get("X-RequestCounter-Reset")) or 60)
         r.raise_for_status()
-    except Exception as e:
-        logging.error(f"Erro ao buscar jogos {status_filter} para {league_code}: {e}")
-        return []
+        return r
+
+    async def get(self, caminho, params=None, prazo=None, headers=None, prioritario=False):
+        """
+        GET em 'caminho' (relativo a API_BASE_URL). Levanta httpx.HTTPError ou asyncio.TimeoutError.
+        'prioritario' passa na frente do updater na fila da cota (consultas com usuário esperando).
+        O 'prazo' vale só para a troca HTTP: a espera pela cota fica fora dele, senão quem está no fim
+        da fila do updater estouraria o prazo sem nem chegar a fazer a requisição.
+        """
+        await LIMITADOR_API.adquirir(prioritario)
+        try:
+            r = await asyncio.wait_for(self._requisitar(caminho, params, headers), prazo or self.timeout)
+        except asyncio.TimeoutError:
+            TELEMETRIA.incrementar("bot_upstream_requisicoes_total", servico="football_data", resultado="timeout")
+            raise
+        except httpx.HTTPStatusError as e:
+            TELEMETRIA.incrementar("bot_upstream_requisicoes_total", servico="football_data", resultado=str(e.response.status_code)) # 429 inclusive
+            raise
+        except httpx.HTTPError:
+            TELEMETRIA.incrementar("bot_upstream_requisicoes_total", servico="football_data", resultado="conexao")
+            raise
+        TELEMETRIA.incrementar("bot_upstream_requisicoes_total", servico="football_data", resultado=str(r.status_code))
+        return r
+
+    async def fechar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+CLIENTE_API = ClienteAPI(API_BASE_URL, API_KEY, API_MAX_CONEXOES, API_TIMEOUT_SEGUNDOS)
+
+# ETag da última resposta de /matches por liga: {league_code: (params, etag, matches)}
+_ETAGS_PARTIDAS = {}
+
+@TELEMETRIA.cronometrar("bot_funcao_segundos")
+async def buscar_jogos(league_code, data_de=None):
+    """
+    Busca as partidas da liga com UMA requisição a /matches e separa em (finalizados, agendados).
+    'data_de' limita a janela de data_de até +FUTURE_JANELA_DIAS (histórico incremental + próximos jogos).
+    Usa requisição condicional (If-None-Match) quando a API devolve ETag. Retorna None em caso de erro.
+    """
+    params = {}
+    if data_de:
+        params["dateFrom"] = data_de.strftime('%Y-%m-%d')
+        params["dateTo"] = (datetime.now(timezone.utc) + timedelta(days=FUTURE_JANELA_DIAS)).strftime('%Y-%m-%d')
 
-    all_matches = r.json().get("matches", [])
+    anterior = _ETAGS_PARTIDAS.get(league_code)
+    headers = {"If-None-Match": anterior[1]} if anterior and anterior[0] == params else None
 
-    if status_filter == "ALL":
-        # Garante que apenas jogos agendados ou cronometrados (futuros) sejam retornados.
-        return [m for m in all_matches if m.get('status') in ['SCHEDULED', 'TIMED']]
+    try:
+        r = await CLIENTE_API.get(f"/competitions/{league_code}/matches", params=params, headers=headers)
+    except Exception as e:
+        logging.error(f"Erro ao buscar jogos para {league_code}: {e}")
+        return None
 
+    if r.status_code == 304:
+        all_matches = anterior[2] # Nada mudou desde a última busca
     else:
-        # Lógica original para jogos FINISHED
-        jogos = []
-        for m in all_matches:
-            if m.get('status') == "FINISHED":
-                try:
-                    jogo_data = datetime.strptime(m['utcDate'][:10], "%Y-%m-%d")
-                    ft = m.get("score", {}).get("fullTime", {})
-                    ht = m.get("score", {}).get("halfTime", {})
-                    if ft.get("home") is None: continue
-
-                    gm, gv = ft.get("home",0), ft.get("away",0)
-                    gm1, gv1 = ht.get("home",0), ht.get("away",0)
-
-                    jogos.append({
-                        "Mandante": m.get("homeTeam", {}).get("name", ""),
-                        "Visitante": m.get("awayTeam", {}).get("name", ""),
-                        "Gols Mandante": gm, "Gols Visitante": gv,
-                        "Gols Mandante 1T": gm1, "Gols Visitante 1T": gv1,
-                        "Gols Mandante 2T": gm - gm1, "Gols Visitante 2T": gv - gv1,
-                        "Data": jogo_data.strftime("%d/%m/%Y")
-                    })
-                except: continue
-        return sorted(jogos, key=lambda x: datetime.strptime(x['Data'], "%d/%m/%Y"))
-
-def buscar_jogos_live(league_code):
-    """Busca jogos AO VIVO (IN_PLAY, HALF_TIME, PAUSED) buscando todos os jogos do dia na API."""
-    hoje_utc = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        all_matches = r.json().get("matches", [])
+        etag = r.headers.get("ETag")
+        if etag: _ETAGS_PARTIDAS[league_code] = (params, etag, all_matches)
+        else: _ETAGS_PARTIDAS.pop(league_code, None)
 
-    try:
-        # Busca todos os jogos da liga que ocorrem na data de hoje
-        url = f"https://api.football-data.org/v4/competitions/{league_code}/matches?dateFrom={hoje_utc}&dateTo={hoje_utc}"
+    return separar_partidas(all_matches)
 
-        r = requests.get(
-            url,
-            headers={"X-Auth-Token": API_KEY}, timeout=10
+def separar_partidas(all_matches):
+    """Separa o payload de /matches em (finalizados no formato da planilha, agendados SCHEDULED/TIMED)."""
+    jogos = []
+    agendados = []
+    for m in all_matches:
+        status = m.get('status')
+        if status in ['SCHEDULED', 'TIMED']:
+            # Jogos agendados ou cronometrados (futuros)
+            agendados.append(m)
+        elif status == "FINISHED":
+            try:
+                jogo_data = datetime.strptime(m['utcDate'][:10], "%Y-%m-%d")
+                ft = m.get("score", {}).get("fullTime", {})
+                ht = m.get("score", {}).get("halfTime", {})
+                if ft.get("home") is None: continue
+
+                gm, gv = ft.get("home",0), ft.get("away",0)
+                gm1, gv1 = ht.get("home",0), ht.get("away",0)
+
+                jogos.append({
+                    "Mandante": m.get("homeTeam", {}).get("name", ""),
+                    "Visitante": m.get("awayTeam", {}).get("name", ""),
+                    "Gols Mandante": gm, "Gols Visitante": gv,
+                    "Gols Mandante 1T": gm1, "Gols Visitante 1T": gv1,
+                    "Gols Mandante 2T": gm - gm1, "Gols Visitante 2T": gv - gv1,
+                    "Data": jogo_data.strftime("%d/%m/%Y")
+                })
+            except: continue
+    jogos.sort(key=lambda x: _data_ordinal(x['Data']))
+    return jogos, agendados
+
+@TELEMETRIA.cronometrar("bot_funcao_segundos")
+async def buscar_jogos_live(league_code):
+    """Busca jogos AO VIVO (IN_PLAY, HALF_TIME, PAUSED) buscando os jogos de ontem e hoje na API."""
+    hoje_utc = datetime.now(timezone.utc).date()
+
+    try:
+        # Ontem + hoje (UTC): jogo que começou às 22h/23h UTC continua AO VIVO depois da meia-noite
+        r = await CLIENTE_API.get(
+            f"/competitions/{league_code}/matches",
+            params={"dateFrom": (hoje_utc - timedelta(days=1)).isoformat(), "dateTo": hoje_utc.isoformat()},
+            prazo=API_PRAZO_LIVE_SEGUNDOS,
+            prioritario=True
         )
-        r.raise_for_status()
     except Exception as e:
         logging.error(f"Erro ao buscar jogos AO VIVO (busca por data) para {league_code}: {e}")
-        return []
+        return None
 
     all_matches = r.json().get("matches", [])
 
@@ -271,6 +1214,7 @@ def buscar_jogos_live(league_code):
                             minute = "1ºT"
 
                 jogos.append({
+                    "Id": m.get("id"),
                     "Mandante_Nome": m.get("homeTeam", {}).get("name", ""),
                     "Visitante_Nome": m.get("awayTeam", {}).get("name", ""),
                     "Placar_Mandante": gm_atual,
@@ -282,263 +1226,561 @@ def buscar_jogos_live(league_code):
 
     return jogos
 
+# =================================================================================
+# 🔴 PLACARES AO VIVO: SNAPSHOT COMPARTILHADO + POLLER EM SEGUNDO PLANO
+# =================================================================================
+# Um snapshot por liga: {aba_code: {'jogos': [...], 'timestamp': monotonic}}. Os cliques em "AO VIVO" leem daqui,
+# então o volume de requisições à API não cresce com o número de usuários.
+LIVE_CACHE = {}
+_LIVE_EM_VOO = {} # aba_code -> Task da busca em andamento (single-flight)
+_LIVE_ULTIMA_RODADA = {} # aba_code -> monotonic da última vez que o poller consultou a liga (ordem do revezamento)
+
+def _liga_com_jogo_em_andamento(jogos_agendados, agora_utc):
+    """True se algum jogo do _FJ começou há menos de LIVE_JANELA_MINUTOS (ou começa nos próximos minutos)."""
+    inicio = agora_utc - timedelta(minutes=LIVE_JANELA_MINUTOS)
+    fim = agora_utc + timedelta(seconds=LIVE_POLL_SEGUNDOS)
+    return any(j.get('Data_UTC') and inicio <= j['Data_UTC'] <= fim for j in jogos_agendados)
+
+async def _recarregar_ao_vivo(aba_code):
+    """Consulta a API e grava o snapshot. Em falha devolve o último snapshot, ou None se ainda não há nenhum."""
+    jogos = await buscar_jogos_live(aba_code)
+    if jogos is None:
+        # Falha na API: mantém o último snapshot (se houver) em vez de mostrar "nenhum jogo"
+        snapshot = LIVE_CACHE.get(aba_code)
+        return snapshot['jogos'] if snapshot else None
+    LIVE_CACHE[aba_code] = {'jogos': jogos, 'timestamp': time.monotonic()}
+    return jogos
+
+async def _buscar_ao_vivo(aba_code):
+    """Atualiza o snapshot da liga; chamadas simultâneas compartilham a mesma requisição."""
+    tarefa = _LIVE_EM_VOO.get(aba_code)
+    if tarefa is None:
+        tarefa = asyncio.ensure_future(_recarregar_ao_vivo(aba_code))
+        _LIVE_EM_VOO[aba_code] = tarefa
+        tarefa.add_done_callback(lambda _: _LIVE_EM_VOO.pop(aba_code, None))
+    return await asyncio.shield(tarefa)
+
+async def obter_ao_vivo(aba_code):
+    """Jogos ao vivo da liga a partir do snapshot em memória; só consulta a API se o snapshot estiver velho. None = falha sem snapshot."""
+    snapshot = LIVE_CACHE.get(aba_code)
+    if snapshot and time.monotonic() - snapshot['timestamp'] < LIVE_CACHE_TTL_SEGUNDOS:
+        return snapshot['jogos']
+    return await _buscar_ao_vivo(aba_code)
+
+@TELEMETRIA.cronometrar("bot_job_segundos")
+async def atualizar_ao_vivo(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Poller do JobQueue: atualiza o snapshot apenas das ligas com jogo em andamento
+    (jogo do _FJ dentro da janela de horário ou snapshot anterior ainda com jogos ao vivo).
+    Cada rodada consulta no máximo LIVE_LIGAS_POR_RODADA ligas (a parte da cota reservada ao AO VIVO):
+    as ativas se revezam, da consultada há mais tempo para a mais recente.
+    """
+    agora_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+    ativas = []
+    for aba_code in LIGAS_MAP:
+        snapshot = LIVE_CACHE.get(aba_code)
+        if snapshot and snapshot['jogos']:
+            ativas.append(aba_code)
+            continue
+        if _liga_com_jogo_em_andamento(await get_sheet_data_future_async(aba_code), agora_utc):
+            ativas.append(aba_code)
+
+    ativas.sort(key=lambda aba_code: _LIVE_ULTIMA_RODADA.get(aba_code, 0.0))
+    rodada = ativas[:LIVE_LIGAS_POR_RODADA]
+    for aba_code in rodada: _LIVE_ULTIMA_RODADA[aba_code] = time.monotonic()
+    if rodada:
+        await asyncio.gather(*(_buscar_ao_vivo(aba_code) for aba_code in rodada))
+
+    # Repassa os placares novos para quem está seguindo algum jogo dessas ligas
+    for aba_code in rodada:
+        snapshot = LIVE_CACHE.get(aba_code)
+        if snapshot: SEGUIDORES.publicar(context.bot, aba_code, snapshot['jogos'])
+
+def _texto_acompanhamento(jogo, encerrado=False):
+    m_safe = escape_markdown(jogo['Mandante_Nome'])
+    v_safe = escape_markdown(jogo['Visitante_Nome'])
+    placar = f"**{m_safe}** {jogo['Placar_Mandante']} x {jogo['Placar_Visitante']} **{v_safe}**"
+    if encerrado:
+        return f"🏁 **Jogo encerrado** (último placar ao vivo)\n{placar}"
+    return f"🔴 **AO VIVO** | {jogo['Tempo_Jogo']}\n{placar}\n\n🔔 Esta mensagem é atualizada automaticamente."
+
+# Trechos do BadRequest do Telegram quando a mensagem seguidora não existe mais (ou não pode mais ser editada)
+MENSAGEM_INEXISTENTE = ("message to edit not found", "message can't be edited", "message_id_invalid", "chat not found")
+
+class SeguidoresAoVivo:
+    """
+    Assinaturas de "seguir jogo". Cada seguidor é uma mensagem do bot, editada quando placar ou minuto mudam.
+    Uma consulta por liga (poller) alimenta todos os seguidores; as edições saem em lotes respeitando
+    o LIMITADOR_TELEGRAM, e um seguidor atrasado sempre recebe a versão mais recente do texto.
+    """
+    def __init__(self, limitador):
+        self.limitador = limitador
+        # (aba_code, id_jogo) -> {'jogo', 'texto', 'versao', 'encerrado', 'assinantes': {(chat_id, message_id): versao_enviada}, 'tarefa'}
+        self._jogos = {}
+
+    def seguir(self, aba_code, jogo, chat_id, message_id):
+        """Registra a mensagem como seguidora do jogo e retorna o texto atual a ser exibido nela."""
+        chave = (aba_code, jogo['Id'])
+        acompanhamento = self._jogos.get(chave)
+        if acompanhamento is None:
+            acompanhamento = self._jogos[chave] = {
+                'jogo': jogo, 'texto': _texto_acompanhamento(jogo), 'versao': 0, 'encerrado': False, 'assinantes': {}, 'tarefa': None
+            }
+        acompanhamento['assinantes'][(chat_id, message_id)] = acompanhamento['versao']
+        return acompanhamento['texto']
+
+    def parar(self, aba_code, id_jogo, chat_id, message_id):
+        acompanhamento = self._jogos.get((aba_code, id_jogo))
+        if acompanhamento:
+            acompanhamento['assinantes'].pop((chat_id, message_id), None)
+            if not acompanhamento['assinantes'] and not acompanhamento['tarefa']:
+                del self._jogos[(aba_code, id_jogo)]
+
+    def publicar(self, bot, aba_code, jogos_ao_vivo):
+        """Compara o snapshot novo com o último texto enviado e dispara as edições necessárias."""
+        por_id = {j.get('Id'): j for j in jogos_ao_vivo}
+        for (aba, id_jogo), acompanhamento in list(self._jogos.items()):
+            if aba != aba_code or acompanhamento['encerrado']: continue
+            jogo = por_id.get(id_jogo)
+            if jogo is None:
+                # Saiu da lista AO VIVO: encerra com o último placar conhecido
+                texto = _texto_acompanhamento(acompanhamento['jogo'], encerrado=True)
+                acompanhamento['encerrado'] = True
+            else:
+                acompanhamento['jogo'] = jogo
+                texto = _texto_acompanhamento(jogo)
+            if texto != acompanhamento['texto']:
+                acompanhamento['texto'] = texto
+                acompanhamento['versao'] += 1
+            if acompanhamento['tarefa'] is None and (acompanhamento['encerrado'] or acompanhamento['versao']):
+                acompanhamento['tarefa'] = asyncio.ensure_future(self._distribuir(bot, (aba, id_jogo)))
+
+    async def _distribuir(self, bot, chave):
+        """Edita as mensagens seguidoras em lotes até todas estarem na versão mais recente."""
+        acompanhamento = self._jogos[chave]
+        try:
+            while True:
+                pendentes = [a for a, v in acompanhamento['assinantes'].items() if v < acompanhamento['versao']]
+                if not pendentes: break
+                for i in range(0, len(pendentes), TELEGRAM_LOTE_EDICOES):
+                    lote = pendentes[i:i + TELEGRAM_LOTE_EDICOES]
+                    await asyncio.gather(*(self._editar(bot, chave, acompanhamento, a) for a in lote))
+        finally:
+            acompanhamento['tarefa'] = None
+            if acompanhamento['encerrado'] or not acompanhamento['assinantes']:
+                self._jogos.pop(chave, None)
+
+    async def _editar(self, bot, chave, acompanhamento, assinante):
+        await self.limitador.adquirir()
+        versao, texto = acompanhamento['versao'], acompanhamento['texto']
+        chat_id, message_id = assinante
+        botoes = None
+        if not acompanhamento['encerrado']:
+            aba_code, id_jogo = chave
+            botoes = InlineKeyboardMarkup([[InlineKeyboardButton("🔕 Parar de seguir", callback_data=f"PARAR_SEGUIR|{aba_code}|{id_jogo}")]])
+        try:
+            await bot.edit_message_text(texto, chat_id=chat_id, message_id=message_id, reply_markup=botoes, parse_mode='Markdown')
+        except RetryAfter as e:
+            # Limite do Telegram: pausa todo o envio e deixa a mensagem pendente para a próxima volta
+            self.limitador.pausar(e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else e.retry_after)
+            return
+        except BadRequest as e:
+            erro = str(e).lower()
+            if any(m in erro for m in MENSAGEM_INEXISTENTE):
+                # Mensagem apagada/inacessível: remove o seguidor
+                logging.warning(f"Removendo seguidor {assinante} do jogo {chave}: {e}")
+                acompanhamento['assinantes'].pop(assinante, None)
+                return
+            if "not modified" not in erro:
+                # Outro erro de requisição (ex.: Markdown): pula esta versão, o seguidor continua inscrito
+                logging.error(f"Erro ao atualizar seguidor {assinante} do jogo {chave}: {e}")
+        except Forbidden:
+            acompanhamento['assinantes'].pop(assinante, None) # Usuário bloqueou o bot
+            return
+        except NetworkError as e:
+            # Timeout/rede: a edição é idempotente, então fica pendente e sai na próxima volta
+            logging.warning(f"Falha de rede ao atualizar seguidor {assinante} do jogo {chave}: {e}")
+            self.limitador.pausar(TELEGRAM_PAUSA_REDE_SEGUNDOS)
+            return
+        except Exception as e:
+            logging.error(f"Erro ao atualizar seguidor {assinante} do jogo {chave}: {e}")
+        if assinante in acompanhamento['assinantes']:
+            acompanhamento['assinantes'][assinante] = versao
+
+# Orçamento de saída para as edições (o Telegram aceita ~30 mensagens/s por bot)
+LIMITADOR_TELEGRAM = LimitadorTaxa(TELEGRAM_EDICOES_POR_SEGUNDO * 60, rajada=TELEGRAM_EDICOES_POR_SEGUNDO)
+SEGUIDORES = SeguidoresAoVivo(LIMITADOR_TELEGRAM)
+
+@TELEMETRIA.cronometrar("bot_job_segundos")
 async def atualizar_planilhas(context: ContextTypes.DEFAULT_TYPE):
     """Atualiza o histórico e o cache de futuros jogos. Função para o JobQueue."""
-    global SHEET_CACHE
-
     if not client:
         logging.error("Atualização de planilhas ignorada: Cliente GSheets não autorizado.")
         return
         
-    try: sh = client.open_by_url(SHEET_URL)
+    try: await _executar_sheets(PLANILHA.planilha)
     except:
         logging.error("Erro ao abrir planilha para atualização.")
         return
 
     logging.info("Iniciando a atualização periódica das planilhas...")
 
-    for aba_code, aba_config in LIGAS_MAP.items():
-        # 1. ATUALIZAÇÃO DO HISTÓRICO (ABA_PASSADO)
-        aba_past = aba_config['sheet_past']
-        try: ws_past = sh.worksheet(aba_past)
-        except WorksheetNotFound: 
-            logging.warning(f"Aba de histórico '{aba_past}' não encontrada. Ignorando...")
-            continue
-
-        jogos_finished = buscar_jogos(aba_code, "FINISHED")
-        await asyncio.sleep(10) # Pausa para respeitar limite de rate da API
+    # Ligas em paralelo; o ritmo real é ditado pelo LIMITADOR_API (cota de requisições por minuto)
+    limite_ligas = asyncio.Semaphore(MAX_LIGAS_CONCORRENTES)
 
-        if jogos_finished:
+    async def _atualizar_com_limite(aba_code, aba_config):
+        async with limite_ligas:
             try:
-                exist = ws_past.get_all_records()
-                keys_exist = {(r['Mandante'], r['Visitante'], r['Data']) for r in exist}
-
-                novas_linhas = []
-                for j in jogos_finished:
-                    key = (j["Mandante"], j["Visitante"], j["Data"])
-                    if key not in keys_exist:
-                        novas_linhas.append([
-                            j["Mandante"], j["Visitante"], j["Gols Mandante"], j["Gols Visitante"],
-                            j["Gols Mandante 1T"], j["Gols Visitante 1T"],
-                            j["Gols Mandante 2T"], j["Gols Visitante 2T"], j["Data"]
-                        ])
-
-                if novas_linhas:
-                    ws_past.append_rows(novas_linhas)
-                    logging.info(f"✅ {len(novas_linhas)} jogos adicionados ao histórico de {aba_past}.")
-
-                if aba_past in SHEET_CACHE: del SHEET_CACHE[aba_past]
+                return await _atualizar_liga(aba_code, aba_config)
             except Exception as e:
-                logging.error(f"Erro ao inserir dados na planilha {aba_past}: {e}")
-
-        # 2. ATUALIZAÇÃO DO CACHE DE FUTUROS JOGOS (ABA_FUTURE)
-        aba_future = aba_config['sheet_future']
-        
-        try: ws_future = sh.worksheet(aba_future)
-        except WorksheetNotFound:
-            logging.warning(f"Aba de futuros jogos '{aba_future}' não encontrada. Ignorando...")
-            continue
+                logging.error(f"Erro inesperado ao atualizar a liga {aba_code}: {e}")
 
-        jogos_future = buscar_jogos(aba_code, "ALL")
-        await asyncio.sleep(10) # Pausa para respeitar limite de rate da API
+    inicio = time.monotonic()
+    resultados = await asyncio.gather(*(_atualizar_com_limite(aba_code, aba_config) for aba_code, aba_config in LIGAS_MAP.items()))
 
+    # Abas _FJ reescritas no ciclo: recarrega todas numa única leitura em lote
+    futuros_alterados = [aba for aba in resultados if aba]
+    if futuros_alterados:
         try:
-            ws_future.clear()
-            ws_future.update(values=[['Mandante', 'Visitante', 'Data/Hora', 'Matchday']], range_name='A1:D1')
+            with TELEMETRIA.medir("bot_atualizacao_etapa_segundos", etapa="recarga_futuros"):
+                erros = await _executar_sheets(carregar_em_lote, (), futuros_alterados)
+        except Exception as e:
+            erros = dict.fromkeys(futuros_alterados, e)
+        for aba, e in erros.items():
+            logging.warning(f"Recarga em lote de {aba} falhou ({e}); revalidando individualmente.")
+            FUTURE_CACHE.marcar_obsoleto(aba)
+
+    logging.info(f"🔄 Atualização de {len(LIGAS_MAP)} ligas concluída em {time.monotonic() - inicio:.1f}s.")
+    logging.info(f"📦 Cache histórico: {SHEET_CACHE.estatisticas()} | Cache futuros: {FUTURE_CACHE.estatisticas()} | Cache textos: {TEXTO_CACHE.estatisticas()}")
+
+# Abas cujo append_rows falhou sem confirmação: a planilha pode ter recebido as linhas mesmo assim
+_APPEND_INCERTO = set()
+
+async def _atualizar_liga(aba_code, aba_config):
+    """Sincroniza histórico e _FJ de uma liga. Retorna o nome da aba _FJ se ela foi reescrita (para a recarga em lote)."""
+    # 1. ATUALIZAÇÃO DO HISTÓRICO (ABA_PASSADO)
+    aba_past = aba_config['sheet_past']
+    try: await _executar_sheets(PLANILHA.worksheet, aba_past)
+    except WorksheetNotFound: 
+        logging.warning(f"Aba de histórico '{aba_past}' não encontrada. Ignorando...")
+        return
 
-            if jogos_future:
-                linhas_future = []
+    # Sincronização incremental: só pede à API os jogos desde a marca d'água da liga (com margem)
+    marca_dagua = await _executar_sheets(ESPELHO.marca_dagua, aba_past)
+    data_de = date.fromordinal(marca_dagua) - timedelta(days=SYNC_MARGEM_DIAS) if marca_dagua else None
 
-                for m in jogos_future:
-                    matchday = m.get("matchday", "")
-                    utc_date = m.get('utcDate', '')
-    
-                    if utc_date:
-                        try:
-                            data_utc = datetime.strptime(utc_date[:16], '%Y-%m-%dT%H:%M')
-                            # Limita a busca a jogos de até 90 dias no futuro
-                            if data_utc < datetime.now() + timedelta(days=90):
-                                linhas_future.append([
-                                    m.get("homeTeam", {}).get("name"),
-                                    m.get("awayTeam", {}).get("name"),
-                                    utc_date,
-                                    matchday
-                                ])
-                        except:
-                            continue
-
-                if linhas_future:
-                    ws_future.append_rows(linhas_future, value_input_option='USER_ENTERED')
-                    logging.info(f"✅ {len(linhas_future)} jogos futuros atualizados no cache de {aba_future}.")
-                else:
-                    logging.info(f"⚠️ Nenhuma partida agendada para {aba_code}. Cache {aba_future} limpo.")
+    # Uma única busca por ciclo alimenta o histórico (FINISHED) e a aba _FJ (agendados)
+    with TELEMETRIA.medir("bot_atualizacao_etapa_segundos", etapa="api"):
+        partidas = await buscar_jogos(aba_code, data_de=data_de)
+    if partidas is None:
+        logging.warning(f"Atualização de {aba_code} adiada para o próximo ciclo: falha ao consultar a API.")
+        return
+    jogos_finished, jogos_future = partidas
 
+    inicio_etapa = time.monotonic()
+    if jogos_finished:
+        try:
+            # Primeira sincronização da liga (ou append anterior sem confirmação): traz para o espelho o que já está na planilha
+            if aba_past in _APPEND_INCERTO or not await _executar_sheets(ESPELHO.total_jogos, aba_past):
+                exist = await _executar_sheets(PLANILHA.executar, aba_past, lambda ws: ws.get_all_records())
+                await _executar_sheets(ESPELHO.inserir, aba_past, [Jogo.de_registro(r) for r in exist])
+                _APPEND_INCERTO.discard(aba_past)
+
+            # Deduplicação pelo índice único do espelho: só o delta vai para a planilha
+            novos = await _executar_sheets(ESPELHO.filtrar_novos, aba_past, jogos_finished)
+
+            if novos:
+                novas_linhas = [[
+                    j["Mandante"], j["Visitante"], j["Gols Mandante"], j["Gols Visitante"],
+                    j["Gols Mandante 1T"], j["Gols Visitante 1T"],
+                    j["Gols Mandante 2T"], j["Gols Visitante 2T"], j["Data"]
+                ] for j in novos]
+                try: await _executar_sheets(PLANILHA.executar, aba_past, lambda ws: ws.append_rows(novas_linhas), False)
+                except Exception:
+                    _APPEND_INCERTO.add(aba_past) # Não repete a escrita: o próximo ciclo confere a planilha antes
+                    raise
+                await _executar_sheets(ESPELHO.inserir, aba_past, [Jogo.de_registro(j) for j in novos])
+                logging.info(f"✅ {len(novas_linhas)} jogos adicionados ao histórico de {aba_past}.")
+
+                # Serve as linhas antigas enquanto a versão nova é buscada em segundo plano (sem miss a frio)
+                SHEET_CACHE.marcar_obsoleto(aba_past)
+
+            # Só avança a marca d'água depois que planilha e espelho receberam o delta
+            nova_marca = max(_data_ordinal(j["Data"]) for j in jogos_finished)
+            await _executar_sheets(ESPELHO.salvar_marca_dagua, aba_past, nova_marca)
         except Exception as e:
-            logging.error(f"Erro ao atualizar cache de futuros jogos em {aba_future}: {e}")
+            logging.error(f"Erro ao inserir dados na planilha {aba_past}: {e}")
+    TELEMETRIA.observar("bot_atualizacao_etapa_segundos", time.monotonic() - inicio_etapa, etapa="historico")
+
+    # 2. ATUALIZAÇÃO DO CACHE DE FUTUROS JOGOS (ABA_FUTURE)
+    aba_future = aba_config['sheet_future']
+    
+    try: await _executar_sheets(PLANILHA.worksheet, aba_future)
+    except WorksheetNotFound:
+        logging.warning(f"Aba de futuros jogos '{aba_future}' não encontrada. Ignorando...")
+        return
+
+    linhas_future = [CABECALHO_FJ]
+    for m in jogos_future:
+        matchday = m.get("matchday", "")
+        utc_date = m.get('utcDate', '')
+
+        if utc_date:
+            try:
+                data_utc = datetime.strptime(utc_date[:16], '%Y-%m-%dT%H:%M')
+                # Limita a busca a jogos de até FUTURE_JANELA_DIAS no futuro
+                if data_utc < datetime.now() + timedelta(days=FUTURE_JANELA_DIAS):
+                    linhas_future.append([
+                        m.get("homeTeam", {}).get("name"),
+                        m.get("awayTeam", {}).get("name"),
+                        utc_date,
+                        matchday
+                    ])
+            except:
+                continue
+
+    try:
+        # Compara com o conteúdo atual e grava só as linhas que mudaram, numa única chamada.
+        # A aba nunca fica vazia no meio da atualização (antes era clear + update + append_rows).
+        with TELEMETRIA.medir("bot_atualizacao_etapa_segundos", etapa="futuros"):
+            alteradas = await _executar_sheets(PLANILHA.executar, aba_future, lambda ws: _gravar_diferencas(ws, linhas_future))
+        if alteradas:
+            logging.info(f"✅ {len(linhas_future) - 1} jogos futuros em {aba_future} ({alteradas} linhas regravadas).")
+            # A versão em memória é recarregada em lote no fim do ciclo (a antiga é servida até lá)
+            return aba_future
+        else:
+            logging.info(f"⏭️ {aba_future} sem mudanças; nenhuma escrita.")
+    except Exception as e:
+        logging.error(f"Erro ao atualizar cache de futuros jogos em {aba_future}: {e}")
+
+CABECALHO_FJ = ['Mandante', 'Visitante', 'Data/Hora', 'Matchday']
 
-        await asyncio.sleep(3) # Pausa entre ligas
+def _normalizar_linha(linha, largura):
+    """Linha como a planilha devolve em get_all_values: texto, com None/ausentes como ''."""
+    linha = ["" if v is None else str(v) for v in linha[:largura]]
+    return linha + [""] * (largura - len(linha))
+
+def _gravar_diferencas(ws, linhas):
+    """
+    (BLOQUEANTE) Grava na aba só as linhas que diferem de 'linhas' (cabeçalho incluso) com um único batch_update.
+    Linhas que sobraram da versão anterior são apagadas. Retorna quantas linhas foram escritas (0 = nada mudou).
+    """
+    largura = len(linhas[0])
+    coluna_final = chr(ord('A') + largura - 1)
+    atuais = [_normalizar_linha(l, largura) for l in ws.get_all_values()]
+    novas = [_normalizar_linha(l, largura) for l in linhas]
+    novas += [[""] * largura] * max(0, len(atuais) - len(novas)) # Limpa o excedente
+
+    # Agrupa linhas alteradas consecutivas em intervalos A{i}:D{j}
+    blocos, inicio = [], None
+    for i, nova in enumerate(novas + [None]):
+        mudou = nova is not None and (i >= len(atuais) or atuais[i] != nova)
+        if mudou and inicio is None: inicio = i
+        elif not mudou and inicio is not None:
+            blocos.append({'range': f"A{inicio + 1}:{coluna_final}{i}", 'values': novas[inicio:i]})
+            inicio = None
+    if not blocos: return 0
+
+    if len(novas) > ws.row_count: ws.add_rows(len(novas) - ws.row_count)
+    ws.batch_update(blocos, value_input_option='USER_ENTERED')
+    return sum(len(b['values']) for b in blocos)
 
 # =================================================================================
 # 📈 FUNÇÕES DE CÁLCULO E FORMATAÇÃO DE ESTATÍSTICAS
 # =================================================================================
-def calcular_estatisticas_time(time, aba, ultimos=None, casa_fora=None):
-    """Calcula estatísticas detalhadas para um time em uma liga."""
-
-    # Dicionário de resultados (Inicialização completa e detalhada)
-    d = {"time":time,"jogos_time":0,"jogos_casa":0,"jogos_fora":0,
-         "over15":0,"over15_casa":0,"over15_fora":0, 
-         "over25":0,"over25_casa":0,"over25_fora":0,
-         "btts":0,"btts_casa":0,"btts_fora":0, "g_a_t":0,"g_a_t_casa":0,"g_a_t_fora":0, "over05_1T":0,"over05_1T_casa":0,"over05_1T_fora":0,
-         "over05_2T":0,"over05_2T_casa":0,"over05_2T_fora":0, "over15_2T":0,"over15_2T_casa":0,"over15_2T_fora":0,
-         "gols_marcados":0,"gols_sofridos":0, "gols_marcados_casa":0,"gols_sofridos_casa":0,
-         "gols_marcados_fora":0,"gols_sofridos_fora":0, "total_gols":0,"total_gols_casa":0,"total_gols_fora":0,
-         "gols_marcados_1T":0,"gols_sofridos_1T":0, "gols_marcados_2T":0,"gols_sofridos_2T":0,
-         "gols_marcados_1T_casa":0,"gols_sofridos_1T_casa":0, "gols_marcados_1T_fora":0,"gols_sofridos_1T_fora":0,
-         "gols_marcados_2T_casa":0,"gols_sofridos_2T_casa":0, "gols_marcados_2T_fora":0,"gols_sofridos_2T_fora":0,
-         
-         # ===== ADICIONADO AQUI (Novos Contadores) =====
-         "marcou_2_mais":0, "marcou_2_mais_casa":0, "marcou_2_mais_fora":0,
-         "sofreu_2_mais":0, "sofreu_2_mais_casa":0, "sofreu_2_mais_fora":0,
-         "marcou_ambos_tempos":0, "marcou_ambos_tempos_casa":0, "marcou_ambos_tempos_fora":0,
-         "sofreu_ambos_tempos":0, "sofreu_ambos_tempos_casa":0, "sofreu_ambos_tempos_fora":0
-         # ===============================================
-        }
+# Métricas contadas por jogo na visão do time. Cada uma vira 3 chaves no dicionário de estatísticas:
+# 'nome' (geral), 'nome_casa' e 'nome_fora'. A ordem define as colunas da matriz de somas.
+METRICAS = [
+    "over15", "over25", "btts", "g_a_t", "over05_1T", "over05_2T", "over15_2T",
+    "gols_marcados", "gols_sofridos", "total_gols",
+    "gols_marcados_1T", "gols_sofridos_1T", "gols_marcados_2T", "gols_sofridos_2T",
+    "marcou_2_mais", "sofreu_2_mais", "marcou_ambos_tempos", "sofreu_ambos_tempos",
+]
 
-    try:
-        linhas = get_sheet_data(aba)
-    except:
-        return {"time":time, "jogos_time": 0}
+def _metricas_por_jogo(gm, gv, gm1, gv1, em_casa):
+    """Matriz (len(METRICAS) x jogos) com o valor de cada métrica por jogo, calculada com máscaras vetorizadas."""
+    gm2, gv2 = gm - gm1, gv - gv1 # Gols no 2T (FT - 1T)
+    total, total1, total2 = gm + gv, gm1 + gv1, gm2 + gv2
+
+    # Gols na visão do *time específico*
+    marcados, sofridos = np.where(em_casa, gm, gv), np.where(em_casa, gv, gm)
+    marcados_1t, sofridos_1t = np.where(em_casa, gm1, gv1), np.where(em_casa, gv1, gm1)
+    marcados_2t, sofridos_2t = np.where(em_casa, gm2, gv2), np.where(em_casa, gv2, gm2)
+
+    return np.stack([
+        total > 1.5, total > 2.5, (gm > 0) & (gv > 0), (total1 > 0) & (total2 > 0), # G.A.T.: gol em ambos os tempos
+        total1 > 0.5, total2 > 0.5, total2 > 1.5,
+        marcados, sofridos, total,
+        marcados_1t, sofridos_1t, marcados_2t, sofridos_2t,
+        marcados >= 2, sofridos >= 2, # 2+ gols marcados / sofridos
+        (marcados_1t > 0) & (marcados_2t > 0), (sofridos_1t > 0) & (sofridos_2t > 0), # M.A.T. / S.A.T.
+    ]).astype(np.int64)
+
+def _somar_metricas(grupo, n_grupos, gm, gv, gm1, gv1, em_casa):
+    """
+    Soma as métricas por grupo (id do time) separando casa/fora, tudo em uma passada.
+    Retorna (jogos_casa[n], jogos_fora[n], somas_casa[n, k], somas_fora[n, k]).
+    """
+    metricas = _metricas_por_jogo(gm, gv, gm1, gv1, em_casa)
+    fora = ~em_casa
+    grupo_casa, grupo_fora = grupo[em_casa], grupo[fora]
+
+    somas_casa = np.zeros((n_grupos, len(METRICAS)), dtype=np.int64)
+    somas_fora = np.zeros((n_grupos, len(METRICAS)), dtype=np.int64)
+    for j, valores in enumerate(metricas):
+        somas_casa[:, j] = np.bincount(grupo_casa, weights=valores[em_casa], minlength=n_grupos)
+        somas_fora[:, j] = np.bincount(grupo_fora, weights=valores[fora], minlength=n_grupos)
+
+    jogos_casa = np.bincount(grupo_casa, minlength=n_grupos)
+    jogos_fora = np.bincount(grupo_fora, minlength=n_grupos)
+    return jogos_casa, jogos_fora, somas_casa, somas_fora
+
+def _montar_estatisticas(time, jogos_casa, jogos_fora, somas_casa, somas_fora):
+    """Converte as somas de um time no dicionário usado por formatar_estatisticas."""
+    jogos_casa, jogos_fora = int(jogos_casa), int(jogos_fora)
+    d = {"time": time, "jogos_time": jogos_casa + jogos_fora, "jogos_casa": jogos_casa, "jogos_fora": jogos_fora}
+    for nome, casa, fora in zip(METRICAS, somas_casa.tolist(), somas_fora.tolist()):
+        d[nome] = casa + fora
+        d[f"{nome}_casa"] = casa
+        d[f"{nome}_fora"] = fora
+    return d
 
-    # Aplica filtro casa/fora
-    if casa_fora=="casa":
-        linhas = [l for l in linhas if l['Mandante']==time]
-    elif casa_fora=="fora":
-        linhas = [l for l in linhas if l['Visitante']==time]
-    else:
-        linhas = [l for l in linhas if l['Mandante']==time or l['Visitante']==time]
+def calcular_estatisticas_time(time, aba, ultimos=None, casa_fora=None, historico=None, desde=None, ate=None):
+    """
+    Calcula estatísticas detalhadas para um time em uma liga (histórico já carregado evita I/O no event loop).
+    Janela: 'ultimos' N jogos e/ou datas ordinais 'desde'/'ate' (inclusive).
+    """
+    if historico is None:
+        try:
+            historico = get_sheet_data(aba)
+        except:
+            return {"time":time, "jogos_time": 0}
 
-    # Ordena e filtra os N últimos jogos
-    try:
-        linhas.sort(key=lambda x: datetime.strptime(x['Data'], "%d/%m/%Y"), reverse=False)
-    except: pass
+    # Liga materializada na carga: a janela sai das somas acumuladas do time
+    linha = historico.estatisticas_janela(time, casa_fora, ultimos, desde, ate)
+    if linha is not None:
+        return _montar_estatisticas(time, linha[0], linha[1], linha[2:2 + len(METRICAS)], linha[2 + len(METRICAS):])
 
-    if ultimos:
-        linhas = linhas[-ultimos:]
-
-    for linha in linhas:
-        em_casa = (time == linha['Mandante'])
-        gm, gv = safe_int(linha['Gols Mandante']), safe_int(linha['Gols Visitante'])
-        gm1, gv1 = safe_int(linha['Gols Mandante 1T']), safe_int(linha['Gols Visitante 1T'])
-        gm2, gv2 = gm-gm1, gv-gv1 # Gols no 2T (FT - 1T)
-
-        total, total1, total2 = gm+gv, gm1+gv1, gm2+gv2
-        d["jogos_time"] += 1
-
-        # Variáveis de Gols para o *time específico*
-        team_marcados_ft = 0
-        team_sofridos_ft = 0
-        team_marcados_1t = 0
-        team_sofridos_1t = 0
-        team_marcados_2t = 0
-        team_sofridos_2t = 0
-
-        if em_casa:
-            marcados, sofridos = gm, gv # 'marcados' e 'sofridos' são para o time (FT)
-            team_marcados_ft = gm
-            team_sofridos_ft = gv
-            team_marcados_1t = gm1
-            team_sofridos_1t = gv1
-            team_marcados_2t = gm2
-            team_sofridos_2t = gv2
-            
-            d["jogos_casa"] += 1
-            d["gols_marcados_1T_casa"] += gm1
-            d["gols_sofridos_1T_casa"] += gv1
-            d["gols_marcados_2T_casa"] += gm2
-            d["gols_sofridos_2T_casa"] += gv2
-        else:
-            marcados, sofridos = gv, gm # 'marcados' e 'sofridos' são para o time (FT)
-            team_marcados_ft = gv
-            team_sofridos_ft = gm
-            team_marcados_1t = gv1
-            team_sofridos_1t = gm1
-            team_marcados_2t = gv2
-            team_sofridos_2t = gm2 # Correção de lógica anterior: gm2
-            
-            d["jogos_fora"] += 1
-            d["gols_marcados_1T_fora"] += gv1
-            d["gols_sofridos_1T_fora"] += gm1
-            d["gols_marcados_2T_fora"] += gv2
-            d["gols_sofridos_2T_fora"] += gm2
-
-        # Lógica de Gols (total)
-        d["gols_marcados"] += marcados
-        d["gols_sofridos"] += sofridos
-        if em_casa:
-            d["gols_marcados_casa"] += marcados
-            d["gols_sofridos_casa"] += sofridos
-        else:
-            d["gols_marcados_fora"] += marcados
-            d["gols_sofridos_fora"] += sofridos
-
-        d["total_gols"] += total
-        if em_casa: d["total_gols_casa"] += total
-        else: d["total_gols_fora"] += total
-
-        # Lógica de Over/Under/BTTS (Geral do Jogo)
-        if total>1.5: d["over15"] += 1
-        if total>2.5: d["over25"] += 1
-        if gm>0 and gv>0: d["btts"] += 1
-        if total1>0.5: d["over05_1T"] += 1
-        if total2>0.5: d["over05_2T"] += 1
-        if total2>1.5: d["over15_2T"] += 1
-
-        # GAT (Gol em Ambos os Tempos - Geral do Jogo)
-        gol_no_1t = total1 > 0
-        gol_no_2t = total2 > 0
-        if gol_no_1t and gol_no_2t:
-            d["g_a_t"] += 1
-            d["g_a_t_casa" if em_casa else "g_a_t_fora"] += 1
-            
-        # ===== ADICIONADO AQUI (Lógica dos Novos Cálculos) =====
-        
-        # 1. Marcou 2+ Gols (Usa o FT do time: 'marcados')
-        if marcados >= 2:
-            d["marcou_2_mais"] += 1
-            d["marcou_2_mais_casa" if em_casa else "marcou_2_mais_fora"] += 1
-
-        # 2. Sofreu 2+ Gols (Usa o FT sofrido pelo time: 'sofridos')
-        if sofridos >= 2:
-            d["sofreu_2_mais"] += 1
-            d["sofreu_2_mais_casa" if em_casa else "sofreu_2_mais_fora"] += 1
-
-        # 3. Marcou em Ambos os Tempos (Usa 1T e 2T do time)
-        if team_marcados_1t > 0 and team_marcados_2t > 0:
-            d["marcou_ambos_tempos"] += 1
-            d["marcou_ambos_tempos_casa" if em_casa else "marcou_ambos_tempos_fora"] += 1
-
-        # 4. Sofreu em Ambos os Tempos (Usa 1T e 2T sofridos pelo time)
-        if team_sofridos_1t > 0 and team_sofridos_2t > 0:
-            d["sofreu_ambos_tempos"] += 1
-            d["sofreu_ambos_tempos_casa" if em_casa else "sofreu_ambos_tempos_fora"] += 1
-
-        # =======================================================
-
-        # Estatísticas por condição (casa/fora) - Lógica existente
-        d["over15_casa" if em_casa else "over15_fora"] += (1 if total > 1.5 else 0)
-        d["over25_casa" if em_casa else "over25_fora"] += (1 if total > 2.5 else 0)
-        d["btts_casa" if em_casa else "btts_fora"] += (1 if gm > 0 and gv > 0 else 0)
-        d["over05_1T_casa" if em_casa else "over05_1T_fora"] += (1 if total1 > 0.5 else 0)
-        d["over05_2T_casa" if em_casa else "over05_2T_fora"] += (1 if total2 > 0.5 else 0)
-        d["over15_2T_casa" if em_casa else "over15_2T_fora"] += (1 if total2 > 1.5 else 0)
-
-        d["gols_marcados_1T"] += team_marcados_1t
-        d["gols_sofridos_1T"] += team_sofridos_1t
-        d["gols_marcados_2T"] += team_marcados_2t
-        d["gols_sofridos_2T"] += team_sofridos_2t 
+    # Filtro casa/fora + janela direto do índice (já em ordem cronológica)
+    pos = historico.posicoes(time, casa_fora, ultimos, desde, ate)
+    em_casa = historico.mandante[pos] == historico.id_time.get(time, -1)
+
+    jogos_casa, jogos_fora, somas_casa, somas_fora = _somar_metricas(
+        np.zeros(len(pos), dtype=np.intp), 1,
+        historico.gm[pos], historico.gv[pos], historico.gm1[pos], historico.gv1[pos], em_casa
+    )
+    return _montar_estatisticas(time, jogos_casa[0], jogos_fora[0], somas_casa[0], somas_fora[0])
 
+def calcular_estatisticas_confronto(mandante, visitante, historico, ultimos=None, desde=None, ate=None):
+    """
+    Estatísticas dos confrontos diretos na visão do mandante (mesmo formato de calcular_estatisticas_time),
+    com o retrospecto em 'vitorias', 'empates' e 'derrotas'.
+    """
+    pos = historico.posicoes_confronto(mandante, visitante, ultimos, desde, ate)
+    em_casa = historico.mandante[pos] == historico.id_time.get(mandante, -1)
+    gm, gv = historico.gm[pos], historico.gv[pos]
+
+    jogos_casa, jogos_fora, somas_casa, somas_fora = _somar_metricas(
+        np.zeros(len(pos), dtype=np.intp), 1, gm, gv, historico.gm1[pos], historico.gv1[pos], em_casa
+    )
+    d = _montar_estatisticas(mandante, jogos_casa[0], jogos_fora[0], somas_casa[0], somas_fora[0])
+    saldo = np.where(em_casa, gm - gv, gv - gm)
+    d["vitorias"], d["empates"], d["derrotas"] = int((saldo > 0).sum()), int((saldo == 0).sum()), int((saldo < 0).sum())
     return d
 
+def calcular_estatisticas_liga(aba, ultimos=None, casa_fora=None, historico=None):
+    """
+    Calcula as estatísticas de TODOS os times da liga em uma única passada vetorizada.
+    Retorna {time: dicionário no mesmo formato de calcular_estatisticas_time}.
+    """
+    if historico is None:
+        historico = get_sheet_data(aba)
+
+    jogos_casa, jogos_fora, somas_casa, somas_fora = _somas_liga(historico, ultimos, casa_fora)
+    return {
+        time: _montar_estatisticas(time, jogos_casa[i], jogos_fora[i], somas_casa[i], somas_fora[i])
+        for i, time in enumerate(historico.times)
+    }
+
+def _somas_liga(historico, ultimos=None, casa_fora=None):
+    """Jogos casa/fora e somas das métricas por time (arrays indexados pelo id do time)."""
+    n = len(historico)
+    posicoes = np.arange(n, dtype=np.intp)
+
+    # Uma "visão" por (jogo, time): mandante joga em casa, visitante fora
+    if casa_fora == "casa":
+        grupo, pos, em_casa = historico.mandante, posicoes, np.ones(n, dtype=bool)
+    elif casa_fora == "fora":
+        grupo, pos, em_casa = historico.visitante, posicoes, np.zeros(n, dtype=bool)
+    else:
+        valido = historico.visitante != historico.mandante # Evita contar duas vezes um jogo do time contra ele mesmo
+        grupo = np.concatenate([historico.mandante, historico.visitante[valido]])
+        pos = np.concatenate([posicoes, posicoes[valido]])
+        em_casa = np.concatenate([np.ones(n, dtype=bool), np.zeros(int(valido.sum()), dtype=bool)])
+
+    if ultimos:
+        # Mantém só as 'ultimos' visões mais recentes de cada time
+        ordem = np.lexsort((pos, grupo))
+        grupo_ordenado = grupo[ordem]
+        fim_grupo = np.cumsum(np.bincount(grupo_ordenado, minlength=len(historico.times)))
+        distancia_do_fim = fim_grupo[grupo_ordenado] - 1 - np.arange(len(ordem))
+        selecionadas = ordem[distancia_do_fim < ultimos]
+        grupo, pos, em_casa = grupo[selecionadas], pos[selecionadas], em_casa[selecionadas]
+
+    return _somar_metricas(
+        grupo, len(historico.times),
+        historico.gm[pos], historico.gv[pos], historico.gm1[pos], historico.gv1[pos], em_casa
+    )
+
+def materializar_estatisticas(historico):
+    """
+    Monta as somas acumuladas por time usadas por HistoricoLiga.estatisticas_janela, em uma passada vetorizada:
+    uma visão por (jogo, time), ordenadas por time e data, e o cumsum das métricas ao longo delas.
+    """
+    n, n_times, k = len(historico), len(historico.times), len(METRICAS)
+    posicoes = np.arange(n, dtype=np.intp)
+    valido = historico.visitante != historico.mandante # Evita contar duas vezes um jogo do time contra ele mesmo
+    grupo = np.concatenate([historico.mandante, historico.visitante[valido]])
+    pos = np.concatenate([posicoes, posicoes[valido]])
+    em_casa = np.concatenate([np.ones(n, dtype=bool), np.zeros(int(valido.sum()), dtype=bool)])
+
+    ordem = np.lexsort((pos, grupo))
+    grupo, pos, em_casa = grupo[ordem], pos[ordem], em_casa[ordem]
+    metricas = _metricas_por_jogo(historico.gm[pos], historico.gv[pos], historico.gm1[pos], historico.gv1[pos], em_casa)
+
+    # Uma linha por coluna e uma coluna por visão: o cumsum corre sobre memória contígua.
+    # int32 basta: mesmo somando gols de todas as visões da liga, fica longe do limite
+    valores = np.empty((2 + 2 * k, len(pos)), dtype=np.int32)
+    valores[0], valores[1] = em_casa, ~em_casa
+    np.multiply(metricas, em_casa, out=valores[2:2 + k], casting='unsafe')
+    np.multiply(metricas, ~em_casa, out=valores[2 + k:], casting='unsafe')
+    acumulado = np.zeros((2 + 2 * k, len(pos) + 1), dtype=np.int32)
+    np.cumsum(valores, axis=1, out=acumulado[:, 1:])
+
+    limites = np.arange(n_times + 1)
+    visoes_casa, visoes_fora = np.flatnonzero(em_casa), np.flatnonzero(~em_casa)
+    historico.acumulado = acumulado
+    historico.inicio_visoes = np.searchsorted(grupo, limites)
+    historico.data_visoes = historico.data[pos]
+    historico.visoes_casa, historico.inicio_casa = visoes_casa, np.searchsorted(grupo[visoes_casa], limites)
+    historico.visoes_fora, historico.inicio_fora = visoes_fora, np.searchsorted(grupo[visoes_fora], limites)
+
+def inicio_temporada(aba, historico):
+    """Data ordinal do início da temporada mais recente do histórico (jan-dez nas LIGAS_ANO_CIVIL, jul-jun nas demais)."""
+    if not len(historico) or historico.data[-1] <= 0: return None
+    ultima = date.fromordinal(int(historico.data[-1]))
+    if aba in LIGAS_ANO_CIVIL: return date(ultima.year, 1, 1).toordinal()
+    return date(ultima.year if ultima.month >= 7 else ultima.year - 1, 7, 1).toordinal()
+
+def rotulo_janela(janela_idx):
+    rotulo, ultimos = JANELAS[janela_idx]
+    return f"ÚLTIMOS {ultimos}" if ultimos else rotulo.upper()
+
+def limites_janela(janela_idx, aba, historico):
+    """(ultimos, desde) da janela escolhida no menu."""
+    _, ultimos = JANELAS[janela_idx]
+    return (ultimos, None) if ultimos else (None, inicio_temporada(aba, historico))
+
 def formatar_estatisticas(d):
     """Formata o dicionário de estatísticas para a mensagem do Telegram."""
     jt, jc, jf = d["jogos_time"], d.get("jogos_casa", 0), d.get("jogos_fora", 0)
@@ -572,43 +1814,84 @@ def formatar_estatisticas(d):
             f"🔢 **Média total de gols:** {media(d['total_gols'], jt)} (C: {media(d['total_gols_casa'], jc)} | F: {media(d['total_gols_fora'], jf)})"
     )
 
-def listar_ultimos_jogos(time, aba, ultimos=None, casa_fora=None):
-    """Lista os últimos N jogos de um time com filtros."""
-    try: linhas = get_sheet_data(aba)
-    except: return f"⚠️ Erro ao ler dados da planilha para {escape_markdown(time)}."
-
-    if casa_fora == "casa":
-        linhas = [l for l in linhas if l['Mandante'] == time]
-    elif casa_fora == "fora":
-        linhas = [l for l in linhas if l['Visitante'] == time]
-    else:
-        linhas = [l for l in linhas if l['Mandante'] == time or l['Visitante'] == time]
-
-    try: linhas.sort(key=lambda x: datetime.strptime(x['Data'], "%d/%m/%Y"), reverse=False)
-    except: pass
-
-    if ultimos:
-        linhas = linhas[-ultimos:]
-
-    if not linhas: return f"Nenhum jogo encontrado para **{escape_markdown(time)}** com o filtro selecionado."
-
-    texto_jogos = ""
-    for l in linhas:
-        data = l['Data']
-        gm, gv = safe_int(l['Gols Mandante']), safe_int(l['Gols Visitante'])
-
-        if l['Mandante'] == time:
-            oponente = escape_markdown(l['Visitante'])
-            condicao = "(CASA)"
-            m_cor = "🟢" if gm > gv else ("🟡" if gm == gv else "🔴")
-            texto_jogos += f"{m_cor} {data} {condicao}: **{escape_markdown(time)}** {gm} x {gv} {oponente}\n"
-        else:
-            oponente = escape_markdown(l['Mandante'])
-            condicao = "(FORA)"
-            m_cor = "🟢" if gv > gm else ("🟡" if gv == gm else "🔴")
-            texto_jogos += f"{m_cor} {data} {condicao}: {oponente} {gm} x {gv} **{escape_markdown(time)}**\n"
-
-    return texto_jogos
+def listar_ultimos_jogos(time, aba, ultimos=None, casa_fora=None, historico=None, desde=None, ate=None):
+    """Lista os últimos N jogos de um time com filtros (opcionalmente só entre as datas 'desde' e 'ate')."""
+    if historico is None:
+        try: historico = get_sheet_data(aba)
+        except: return f"⚠️ Erro ao ler dados da planilha para {escape_markdown(time)}."
+
+    jogos = historico.jogos_time(time, casa_fora, ultimos, desde, ate)
+
+    if not jogos: return f"Nenhum jogo encontrado para **{escape_markdown(time)}** com o filtro selecionado."
+
+    return "".join(_linha_resultado(jogo, time) for jogo in jogos)
+
+def _linha_resultado(jogo, time):
+    """Uma linha da lista de resultados, com a cor do resultado na visão de 'time'."""
+    data = jogo.data_str
+    gm, gv = jogo.gm, jogo.gv
+
+    if jogo.mandante == time:
+        oponente = escape_markdown(jogo.visitante)
+        condicao = "(CASA)"
+        m_cor = "🟢" if gm > gv else ("🟡" if gm == gv else "🔴")
+        return f"{m_cor} {data} {condicao}: **{escape_markdown(time)}** {gm} x {gv} {oponente}\n"
+    oponente = escape_markdown(jogo.mandante)
+    condicao = "(FORA)"
+    m_cor = "🟢" if gv > gm else ("🟡" if gv == gm else "🔴")
+    return f"{m_cor} {data} {condicao}: {oponente} {gm} x {gv} **{escape_markdown(time)}**\n"
+
+def formatar_confronto_direto(d, visitante, jogos):
+    """Retrospecto + estatísticas (formatar_estatisticas) + lista dos jogos entre os dois times, na visão do mandante."""
+    mandante = d["time"]
+    if d["jogos_time"] == 0:
+        return f"⚠️ **Nenhum confronto direto** entre **{escape_markdown(mandante)}** e **{escape_markdown(visitante)}** com o filtro selecionado."
+    return (f"⚔️ **Retrospecto de {escape_markdown(mandante)}:** {d['vitorias']}V | {d['empates']}E | {d['derrotas']}D\n\n"
+            + formatar_estatisticas(d)
+            + "\n\n📅 **Jogos**\n" + "".join(_linha_resultado(jogo, mandante) for jogo in jogos))
+
+class CacheTextos:
+    """
+    LRU do Markdown final das respostas de confronto.
+    A chave inclui a versão do HistoricoLiga usado no cálculo: quando o histórico da liga é recarregado
+    a versão muda, as chaves antigas deixam de ser consultadas e saem pela evicção LRU.
+    """
+    def __init__(self, max_entradas=TEXTO_CACHE_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self.contadores = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def obter(self, chave):
+        texto = self._entradas.get(chave)
+        if texto is None:
+            self.contadores["misses"] += 1
+            return None
+        self._entradas.move_to_end(chave)
+        self.contadores["hits"] += 1
+        return texto
+
+    def guardar(self, chave, texto):
+        self._entradas[chave] = texto
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self.contadores["evictions"] += 1
+
+    def estatisticas(self):
+        return {**self.contadores, "entradas": len(self._entradas)}
+
+# Chave: (tipo, aba_code, mandante, visitante, filtro_idx, janela_idx, versao_historico)
+TEXTO_CACHE = CacheTextos()
+
+@TELEMETRIA.coletor
+def _metricas_caches():
+    series = []
+    for nome, cache in (("historico", SHEET_CACHE), ("futuros", FUTURE_CACHE), ("textos", TEXTO_CACHE)):
+        for evento, valor in cache.estatisticas().items():
+            if evento == "entradas": series.append(("bot_cache_entradas", {"cache": nome}, valor))
+            elif evento == "bytes": series.append(("bot_cache_bytes", {"cache": nome}, valor))
+            else: series.append(("bot_cache_eventos_total", {"cache": nome, "evento": evento}, valor))
+    return series
 
 # =================================================================================
 # 🤖 FUNÇÕES DO BOT: HANDLERS E FLUXOS
@@ -671,6 +1954,24 @@ async def mostrar_menu_status_jogo(update: Update, context: ContextTypes.DEFAULT
         )
 
 
+async def carregar_historico_com_aviso(update: Update, aba_code: str):
+    """
+    Histórico da liga para os handlers. Se ele ainda não está em memória (ex.: bot recém-iniciado, aquecimento
+    em andamento), avisa o usuário e adianta a carga desta liga no pool do usuário (ou aguarda a do aquecimento, se já começou).
+    """
+    if LIGAS_MAP[aba_code]['sheet_past'] in SHEET_CACHE:
+        return await get_sheet_data_async(aba_code)
+
+    aviso = None
+    try: aviso = await update.effective_message.reply_text(f"⏳ Carregando os dados de **{aba_code}**, só um instante...", parse_mode='Markdown')
+    except Exception as e: logging.warning(f"Não foi possível enviar o aviso de carregamento: {e}")
+    try:
+        return await get_sheet_data_async(aba_code)
+    finally:
+        if aviso:
+            try: await aviso.delete()
+            except Exception: pass
+
 async def listar_jogos(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_code: str, status: str):
     """Terceira tela: Lista jogos futuros (GSheets) ou ao vivo (API)."""
     jogos_a_listar = []
@@ -688,19 +1989,18 @@ async def listar_jogos(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_c
             logging.error(f"Erro ao editar mensagem de loading FUTURE: {e}")
             pass 
 
-        jogos_agendados = get_sheet_data_future(aba_code)
+        jogos_agendados = await get_sheet_data_future_async(aba_code)
 
         jogos_futuros_filtrados = []
         agora_utc = datetime.now(timezone.utc).replace(tzinfo=None)
 
         for jogo in jogos_agendados:
-            try:
-                data_utc = datetime.strptime(jogo['Data_Hora'][:16], '%Y-%m-%dT%H:%M')
-                if data_utc > agora_utc:
-                    jogos_futuros_filtrados.append(jogo)
-            except Exception as e:
-                logging.warning(f"Erro ao parsear data de jogo futuro: {e}")
+            data_utc = jogo.get('Data_UTC')
+            if data_utc is None:
+                logging.warning(f"Data inválida em jogo futuro: {jogo.get('Data_Hora')}")
                 continue
+            if data_utc > agora_utc:
+                jogos_futuros_filtrados.append(jogo)
 
         jogos_agendados = jogos_futuros_filtrados
 
@@ -729,12 +2029,12 @@ async def listar_jogos(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_c
                 V_full = jogo['Visitante_Nome']
                 data_str = jogo['Data_Hora']
                 
-                try:
-                    data_utc = datetime.strptime(data_str[:16], '%Y-%m-%dT%H:%M')
+                data_utc = jogo.get('Data_UTC')
+                if data_utc is not None:
                     matchday_num = jogo.get('Matchday', "N/A")
                     data_local = data_utc - timedelta(hours=3) # Fuso -3
                     data_label = data_local.strftime('%d/%m %H:%M')
-                except ValueError: 
+                else:
                     data_label = data_str
                     matchday_num = "N/A"
 
@@ -762,7 +2062,17 @@ async def listar_jogos(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_c
             logging.error(f"Erro ao editar mensagem de loading LIVE: {e}")
             pass
             
-        jogos_a_listar = buscar_jogos_live(aba_code)
+        jogos_a_listar = await obter_ao_vivo(aba_code)
+
+        if jogos_a_listar is None:
+            # Falha na API e nenhum snapshot anterior: não dá para afirmar que não há jogos
+            await update.callback_query.edit_message_text(
+                f"⚠️ Não foi possível consultar os jogos AO VIVO de **{aba_code}** agora. Tente novamente em instantes.",
+                parse_mode='Markdown'
+            )
+            keyboard = [[InlineKeyboardButton("⬅️ Voltar para Status", callback_data=f"VOLTAR_LIGA_STATUS|{aba_code}")]]
+            await update.effective_message.reply_text("Opções:", reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
+            return
 
         if not jogos_a_listar:
             await update.callback_query.edit_message_text(
@@ -812,30 +2122,47 @@ async def listar_jogos(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_c
 # ✅ FUNÇÃO CORRIGIDA: MOSTRA MENU DE FILTROS (Após selecionar o JOGO)
 # O menu agora é SEMPRE enviado como NOVA MENSAGEM.
 # =================================================================================
-async def mostrar_menu_acoes(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_code: str, mandante: str, visitante: str):
-    """
-    Quarta tela: Menu para escolher o filtro de Estatísticas/Resultados.
-    CORREÇÃO: SEMPRE envia o menu de filtros como uma NOVA MENSAGEM.
-    """
-    m_sanitized = escape_markdown(mandante)
-    v_sanitized = escape_markdown(visitante)
-
-    title = f"Escolha o filtro para o confronto **{m_sanitized} x {v_sanitized}**:"
-
-    keyboard = []
+def janela_escolhida(context):
+    """Índice em JANELAS escolhido neste chat (padrão: ÚLTIMOS {ULTIMOS})."""
+    idx = context.chat_data.get('janela_idx', JANELA_PADRAO)
+    return idx if 0 <= idx < len(JANELAS) else JANELA_PADRAO
+
+def teclado_acoes(context, aba_code, mandante, visitante):
+    """Botões do menu de filtros: seletor de janela + filtros de Estatísticas/Resultados + voltar."""
+    janela_idx = janela_escolhida(context)
+    keyboard = [[
+        InlineKeyboardButton(f"✅ {rotulo}" if i == janela_idx else rotulo, callback_data=f"JANELA|{i}")
+        for i, (rotulo, _) in enumerate(JANELAS)
+    ]]
     # Cria botões para Estatísticas e Resultados
-    for idx, (label, tipo_filtro, ultimos, condicao_m, condicao_v) in enumerate(CONFRONTO_FILTROS):
+    for idx, (label, tipo_filtro, condicao_m, condicao_v) in enumerate(CONFRONTO_FILTROS):
         
         # **CORREÇÃO: Callback NÃO inclui mais os nomes, apenas o índice do FILTRO.**
         # Os nomes e o aba_code estão salvos no context.chat_data
         callback_data = f"{tipo_filtro}|{idx}"
         
         # **CORREÇÃO: A verificação de 64 bytes não é mais necessária.**
-        keyboard.append([InlineKeyboardButton(label, callback_data=callback_data)])
+        keyboard.append([InlineKeyboardButton(label.format(janela=rotulo_janela(janela_idx)), callback_data=callback_data)])
     
+    # Jogo AO VIVO selecionado: permite acompanhar o placar nesta conversa
+    jogo_live = context.chat_data.get('current_jogo_live')
+    if jogo_live and jogo_live.get('Id') is not None and (jogo_live['Mandante_Nome'], jogo_live['Visitante_Nome']) == (mandante, visitante):
+        keyboard.append([InlineKeyboardButton("🔔 Seguir placar AO VIVO", callback_data="SEGUIR_JOGO")])
+
     # Opções de Voltar
     keyboard.append([InlineKeyboardButton("⬅️ Voltar para Jogos", callback_data=f"VOLTAR_LIGA_STATUS|{aba_code}")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return InlineKeyboardMarkup(keyboard)
+
+async def mostrar_menu_acoes(update: Update, context: ContextTypes.DEFAULT_TYPE, aba_code: str, mandante: str, visitante: str):
+    """
+    Quarta tela: Menu para escolher o filtro de Estatísticas/Resultados.
+    CORREÇÃO: SEMPRE envia o menu de filtros como uma NOVA MENSAGEM.
+    """
+    m_sanitized = escape_markdown(mandante)
+    v_sanitized = escape_markdown(visitante)
+
+    title = f"Escolha o filtro para o confronto **{m_sanitized} x {v_sanitized}**:"
+    reply_markup = teclado_acoes(context, aba_code, mandante, visitante)
 
     # <<<<<<<<<<<<<< CORREÇÃO PRINCIPAL AQUI >>>>>>>>>>>>>>>>>
     # Apenas envia a mensagem como uma nova resposta, mantendo o histórico
@@ -857,25 +2184,38 @@ async def exibir_estatisticas(update: Update, context: ContextTypes.DEFAULT_TYPE
     """
     if not (0 <= filtro_idx < len(CONFRONTO_FILTROS)): return
 
-    # Filtro: (Label, Tipo, Últimos, Condicao_M, Condicao_V)
-    _, _, ultimos, condicao_m, condicao_v = CONFRONTO_FILTROS[filtro_idx]
+    # Filtro: (Label, Tipo, Condicao_M, Condicao_V) + janela escolhida no menu
+    _, _, condicao_m, condicao_v = CONFRONTO_FILTROS[filtro_idx]
+    janela_idx = janela_escolhida(context)
     
-    # Calcula estatísticas para ambos os times e concatena
-    d_m = calcular_estatisticas_time(mandante, aba_code, ultimos=ultimos, casa_fora=condicao_m)
-    d_v = calcular_estatisticas_time(visitante, aba_code, ultimos=ultimos, casa_fora=condicao_v)
-
-    # Gera o texto formatado para Mandante e Visitante
-    texto_estatisticas = (
-        formatar_estatisticas(d_m) + 
-        "\n\n---\n\n" + 
-        formatar_estatisticas(d_v)
-    )
+    # Carrega o histórico sem bloquear o event loop (cache miss vai para o pool do GSheets)
+    chave_texto = None
+    try:
+        historico = await carregar_historico_com_aviso(update, aba_code)
+        chave_texto = ("STATS", aba_code, mandante, visitante, filtro_idx, janela_idx, historico.versao)
+    except Exception as e:
+        logging.error(f"Erro ao carregar histórico de {aba_code}: {e}")
+        historico = HistoricoLiga([])
+
+    # Mesmo confronto, mesmo filtro e mesma versão do histórico: reaproveita o texto já renderizado
+    texto = TEXTO_CACHE.obter(chave_texto) if chave_texto else None
+    if texto is None:
+        # Calcula estatísticas para ambos os times e concatena
+        ultimos, desde = limites_janela(janela_idx, aba_code, historico)
+        d_m = calcular_estatisticas_time(mandante, aba_code, ultimos=ultimos, casa_fora=condicao_m, historico=historico, desde=desde)
+        d_v = calcular_estatisticas_time(visitante, aba_code, ultimos=ultimos, casa_fora=condicao_v, historico=historico, desde=desde)
+
+        # Gera o texto formatado para Mandante e Visitante
+        texto_estatisticas = (
+            formatar_estatisticas(d_m) + 
+            "\n\n---\n\n" + 
+            formatar_estatisticas(d_v)
+        )
+        texto = f"**Confronto:** {escape_markdown(mandante)} x {escape_markdown(visitante)} ({rotulo_janela(janela_idx)})\n\n{texto_estatisticas}"
+        if chave_texto: TEXTO_CACHE.guardar(chave_texto, texto)
     
     # 1. Responde com a ESTATÍSTICA como uma NOVA MENSAGEM na conversa (UX solicitada)
-    await update.effective_message.reply_text(
-        f"**Confronto:** {escape_markdown(mandante)} x {escape_markdown(visitante)}\n\n{texto_estatisticas}",
-        parse_mode='Markdown'
-    )
+    await update.effective_message.reply_text(texto, parse_mode='Markdown')
     
     # 2. Reexibe o menu de opções logo abaixo da estatística (CORREÇÃO DE UX)
     # É necessário chamar a função de menu, que enviará uma nova mensagem com os botões.
@@ -896,24 +2236,39 @@ async def exibir_ultimos_resultados(update: Update, context: ContextTypes.DEFAUL
     """
     if not (0 <= filtro_idx < len(CONFRONTO_FILTROS)): return
 
-    # Filtro: (Label, Tipo, Últimos, Condicao_M, Condicao_V)
-    _, _, ultimos, condicao_m, condicao_v = CONFRONTO_FILTROS[filtro_idx]
+    # Filtro: (Label, Tipo, Condicao_M, Condicao_V) + janela escolhida no menu
+    _, _, condicao_m, condicao_v = CONFRONTO_FILTROS[filtro_idx]
+    janela_idx = janela_escolhida(context)
     
-    # Calcula resultados para ambos os times e concatena
-    texto_jogos_m = listar_ultimos_jogos(mandante, aba_code, ultimos=ultimos, casa_fora=condicao_m)
-    texto_jogos_v = listar_ultimos_jogos(visitante, aba_code, ultimos=ultimos, casa_fora=condicao_v)
-
-    texto_final = (
-        f"📅 **Últimos Resultados - {escape_markdown(mandante)}**\n{texto_jogos_m}" +
-        f"\n\n---\n\n" +
-        f"📅 **Últimos Resultados - {escape_markdown(visitante)}**\n{texto_jogos_v}"
-    )
+    # Carrega o histórico sem bloquear o event loop (cache miss vai para o pool do GSheets)
+    chave_texto = texto = None
+    try:
+        historico = await carregar_historico_com_aviso(update, aba_code)
+        chave_texto = ("RESULTADOS", aba_code, mandante, visitante, filtro_idx, janela_idx, historico.versao)
+        texto = TEXTO_CACHE.obter(chave_texto)
+        if texto is None:
+            # Calcula resultados para ambos os times e concatena (temporada: só os mais recentes cabem na mensagem)
+            ultimos, desde = limites_janela(janela_idx, aba_code, historico)
+            ultimos = ultimos or MAX_RESULTADOS_LISTADOS
+            texto_jogos_m = listar_ultimos_jogos(mandante, aba_code, ultimos=ultimos, casa_fora=condicao_m, historico=historico, desde=desde)
+            texto_jogos_v = listar_ultimos_jogos(visitante, aba_code, ultimos=ultimos, casa_fora=condicao_v, historico=historico, desde=desde)
+    except Exception as e:
+        logging.error(f"Erro ao carregar histórico de {aba_code}: {e}")
+        chave_texto = None # Mensagem de erro não vai para o cache
+        texto_jogos_m = f"⚠️ Erro ao ler dados da planilha para {escape_markdown(mandante)}."
+        texto_jogos_v = f"⚠️ Erro ao ler dados da planilha para {escape_markdown(visitante)}."
+
+    if texto is None:
+        texto_final = (
+            f"📅 **Últimos Resultados - {escape_markdown(mandante)}**\n{texto_jogos_m}" +
+            f"\n\n---\n\n" +
+            f"📅 **Últimos Resultados - {escape_markdown(visitante)}**\n{texto_jogos_v}"
+        )
+        texto = f"**Confronto:** {escape_markdown(mandante)} x {escape_markdown(visitante)} ({rotulo_janela(janela_idx)})\n\n{texto_final}"
+        if chave_texto: TEXTO_CACHE.guardar(chave_texto, texto)
 
     # 1. Responde com os RESULTADOS como uma NOVA MENSAGEM na conversa (UX solicitada)
-    await update.effective_message.reply_text(
-        f"**Confronto:** {escape_markdown(mandante)} x {escape_markdown(visitante)}\n\n{texto_final}",
-        parse_mode='Markdown'
-    )
+    await update.effective_message.reply_text(texto, parse_mode='Markdown')
     
     # 2. Reexibe o menu de opções logo abaixo dos resultados (CORREÇÃO DE UX)
     await mostrar_menu_acoes(update, context, aba_code, mandante, visitante)
@@ -921,11 +2276,56 @@ async def exibir_ultimos_resultados(update: Update, context: ContextTypes.DEFAUL
     # 3. Fecha o relógio de loading do botão (sem pop-up)
     await update.callback_query.answer()
 
+async def exibir_confronto_direto(update: Update, context: ContextTypes.DEFAULT_TYPE, mandante: str, visitante: str, aba_code: str, filtro_idx: int):
+    """
+    Exibe o confronto direto (H2H): retrospecto, estatísticas e jogos entre os dois times, vindos do índice de pares.
+    Envia o resultado como NOVA MENSAGEM e REEXIBE o menu, como os demais filtros.
+    """
+    if not (0 <= filtro_idx < len(CONFRONTO_FILTROS)): return
+    janela_idx = janela_escolhida(context)
+
+    # Carrega o histórico sem bloquear o event loop (cache miss vai para o pool do GSheets)
+    chave_texto = texto = None
+    try:
+        historico = await carregar_historico_com_aviso(update, aba_code)
+        chave_texto = ("H2H", aba_code, mandante, visitante, filtro_idx, janela_idx, historico.versao)
+        texto = TEXTO_CACHE.obter(chave_texto)
+        if texto is None:
+            ultimos, desde = limites_janela(janela_idx, aba_code, historico)
+            d = calcular_estatisticas_confronto(mandante, visitante, historico, ultimos=ultimos, desde=desde)
+            jogos = [historico.jogos[p] for p in historico.posicoes_confronto(mandante, visitante, ultimos or MAX_RESULTADOS_LISTADOS, desde)]
+            texto_h2h = formatar_confronto_direto(d, visitante, jogos)
+    except Exception as e:
+        logging.error(f"Erro ao carregar histórico de {aba_code}: {e}")
+        chave_texto = None # Mensagem de erro não vai para o cache
+        texto_h2h = "⚠️ Erro ao ler dados da planilha para o confronto direto."
+
+    if texto is None:
+        texto = f"**Confronto Direto:** {escape_markdown(mandante)} x {escape_markdown(visitante)} ({rotulo_janela(janela_idx)})\n\n{texto_h2h}"
+        if chave_texto: TEXTO_CACHE.guardar(chave_texto, texto)
+
+    # 1. Responde com o H2H como uma NOVA MENSAGEM na conversa
+    await update.effective_message.reply_text(texto, parse_mode='Markdown')
+
+    # 2. Reexibe o menu de opções logo abaixo
+    await mostrar_menu_acoes(update, context, aba_code, mandante, visitante)
+
+    # 3. Fecha o relógio de loading do botão (sem pop-up)
+    await update.callback_query.answer()
+
 # =================================================================================
 # 🔄 CALLBACK HANDLER PRINCIPAL (Dispara as ações com base no clique do usuário)
 # =================================================================================
+PREFIXOS_CALLBACK = {"c", "STATUS", "JOGO", "JANELA", "STATS_FILTRO", "RESULTADOS_FILTRO", "H2H_FILTRO", "VOLTAR_LIGA_STATUS", "VOLTAR_LIGA", "SEGUIR_JOGO", "PARAR_SEGUIR"}
+
 async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Lida com todos os cliques de botões inline (callbacks)."""
+    """Lida com todos os cliques de botões inline (callbacks), medindo a latência por prefixo do callback_data."""
+    prefixo = (update.callback_query.data or "").split('|', 1)[0]
+    if prefixo not in PREFIXOS_CALLBACK: prefixo = "outro" # Não deixa dados arbitrários virarem rótulos
+    with TELEMETRIA.medir("bot_callback_segundos", prefixo=prefixo):
+        await _tratar_callback(update, context)
+
+async def _tratar_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     
     # Removido o query.answer() daqui para dar tempo da função ser chamada
@@ -968,12 +2368,32 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
             context.chat_data['current_mandante'] = mandante
             context.chat_data['current_visitante'] = visitante
             context.chat_data['current_aba_code'] = aba_code
+            if status == "LIVE": context.chat_data['current_jogo_live'] = jogo
+            else: context.chat_data.pop('current_jogo_live', None)
 
             # Chamada para a função que mostra o menu de filtros
             # Ela ainda precisa dos nomes para o TÍTULO
             await mostrar_menu_acoes(update, context, aba_code, mandante, visitante)
             return
 
+        # Seletor de janela (JANELA|INDEX): guarda a escolha do chat e redesenha os botões do menu
+        if data.startswith("JANELA|"):
+            _, idx_str = data.split('|')
+            janela_idx = safe_int(idx_str)
+            if 'current_mandante' not in context.chat_data or 'current_visitante' not in context.chat_data or 'current_aba_code' not in context.chat_data:
+                 await query.answer("❌ Erro: Sessão expirada. Por favor, reinicie o menu com /stats.", show_alert=True)
+                 return
+            if not (0 <= janela_idx < len(JANELAS)):
+                await query.answer()
+                return
+
+            if janela_idx != janela_escolhida(context):
+                context.chat_data['janela_idx'] = janela_idx
+                teclado = teclado_acoes(context, context.chat_data['current_aba_code'], context.chat_data['current_mandante'], context.chat_data['current_visitante'])
+                await query.edit_message_reply_markup(reply_markup=teclado)
+            await query.answer(f"Janela: {rotulo_janela(janela_idx)}")
+            return
+
         # **CORREÇÃO 4: Filtro de Estatísticas (STATS_FILTRO|INDEX)**
         if data.startswith("STATS_FILTRO|"):
             # Apenas o índice do filtro
@@ -1012,6 +2432,45 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
             await exibir_ultimos_resultados(update, context, mandante, visitante, aba_code, filtro_idx)
             return
         
+        # Confronto direto (H2H_FILTRO|INDEX)
+        if data.startswith("H2H_FILTRO|"):
+            _, idx_str = data.split('|')
+            filtro_idx = safe_int(idx_str)
+
+            # **Recupera os dados do contexto**
+            if 'current_mandante' not in context.chat_data or 'current_visitante' not in context.chat_data or 'current_aba_code' not in context.chat_data:
+                 await query.answer("❌ Erro: Sessão expirada. Por favor, reinicie o menu com /stats.", show_alert=True)
+                 return
+
+            mandante = context.chat_data['current_mandante']
+            visitante = context.chat_data['current_visitante']
+            aba_code = context.chat_data['current_aba_code']
+
+            await exibir_confronto_direto(update, context, mandante, visitante, aba_code, filtro_idx)
+            return
+
+        # Seguir o placar de um jogo AO VIVO (a mensagem enviada é editada pelo poller)
+        if data == "SEGUIR_JOGO":
+            jogo = context.chat_data.get('current_jogo_live')
+            aba_code = context.chat_data.get('current_aba_code')
+            if not jogo or jogo.get('Id') is None or not aba_code:
+                await query.answer("❌ Erro: Sessão expirada. Por favor, reinicie o menu com /stats.", show_alert=True)
+                return
+
+            msg = await update.effective_message.reply_text(_texto_acompanhamento(jogo), parse_mode='Markdown')
+            texto = SEGUIDORES.seguir(aba_code, jogo, msg.chat_id, msg.message_id)
+            botoes = InlineKeyboardMarkup([[InlineKeyboardButton("🔕 Parar de seguir", callback_data=f"PARAR_SEGUIR|{aba_code}|{jogo['Id']}")]])
+            await msg.edit_text(texto, reply_markup=botoes, parse_mode='Markdown')
+            await query.answer("🔔 Você está seguindo este jogo.")
+            return
+
+        if data.startswith("PARAR_SEGUIR|"):
+            _, aba_code, id_str = data.split('|')
+            SEGUIDORES.parar(aba_code, safe_int(id_str), query.message.chat_id, query.message.message_id)
+            await query.edit_message_reply_markup(reply_markup=None)
+            await query.answer("🔕 Você deixou de seguir este jogo.")
+            return
+
         # 6. Voltar para Status 
         if data.startswith("VOLTAR_LIGA_STATUS|"): 
             _, aba_code = data.split('|')
@@ -1044,25 +2503,95 @@ async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_T
 # =================================================================================
 # 🚀 FUNÇÃO PRINCIPAL
 # =================================================================================
-def main():
-    if not BOT_TOKEN or BOT_TOKEN == "SEU_TOKEN_AQUI":
-        logging.error("O token do bot não está configurado. Verifique a variável de ambiente BOT_TOKEN.")
-        sys.exit(1) # Finaliza o processo se o token estiver errado
-        
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+async def metricas_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/metrics: resumo das métricas, só para os IDs em ADMIN_IDS."""
+    usuario = update.effective_user
+    if not usuario or usuario.id not in ADMIN_IDS:
+        logging.warning(f"/metrics negado para o usuário {usuario.id if usuario else '?'}.")
+        return
+    texto = TELEMETRIA.resumo()
+    if len(texto) > 4000: texto = texto[:4000] + "\n…"
+    await update.message.reply_text(texto) # Texto puro: rótulos têm '_' e '[' que quebrariam o Markdown
+
+async def iniciar_aquecimento(application):
+    """post_init: o pré-carregamento roda em segundo plano, o bot já começa a responder enquanto as ligas carregam."""
+    application.bot_data['aquecimento'] = asyncio.create_task(pre_carregar_cache_sheets())
+
+async def encerrar_recursos(application):
+    """Interrompe o aquecimento (se ainda estiver rodando) e fecha as conexões HTTP compartilhadas ao desligar o bot."""
+    aquecimento = application.bot_data.get('aquecimento')
+    if aquecimento and not aquecimento.done(): aquecimento.cancel()
+    await CLIENTE_API.fechar()
+
+class ProcessadorPorChat(BaseUpdateProcessor):
+    """
+    Processa updates de chats diferentes em paralelo (até 'limite' ao mesmo tempo) e os de um mesmo chat
+    em fila, na ordem de chegada: chat_data ('current_mandante', 'current_aba_code'...) nunca é disputado.
+    Updates enfileirados atrás do próprio chat não ocupam vaga de execução, então um chat que clica
+    repetidamente não segura os demais.
+    """
+    __slots__ = ("_execucao", "_filas")
+
+    def __init__(self, limite):
+        super().__init__(max_concurrent_updates=limite * 8) # Admissão: inclui os que aguardam a vez do chat
+        self._execucao = asyncio.Semaphore(limite)
+        self._filas = {} # chave do chat -> [asyncio.Lock, updates pendentes]
+
+    @staticmethod
+    def _chave(update):
+        if not isinstance(update, Update): return None
+        if update.effective_chat: return update.effective_chat.id
+        # Callbacks de mensagens inline não têm chat: serializa por usuário
+        return ("usuario", update.effective_user.id) if update.effective_user else None
+
+    async def do_process_update(self, update, coroutine):
+        chave = self._chave(update)
+        if chave is None:
+            async with self._execucao: await coroutine
+            return
+        fila = self._filas.setdefault(chave, [asyncio.Lock(), 0])
+        fila[1] += 1
+        try:
+            async with fila[0]:
+                async with self._execucao: await coroutine
+        finally:
+            fila[1] -= 1
+            if not fila[1]: self._filas.pop(chave, None)
+
+    async def initialize(self): pass
+
+    async def shutdown(self): pass
+
+def construir_aplicacao(token, base_url=None):
+    """Monta o Application com handlers e jobs. 'base_url' aponta a Bot API para outro servidor (ex.: teste de carga)."""
+    builder = (ApplicationBuilder().token(token).post_init(iniciar_aquecimento).post_shutdown(encerrar_recursos)
+               .concurrent_updates(ProcessadorPorChat(UPDATES_SIMULTANEOS)))
+    if base_url: builder = builder.base_url(base_url)
+    app = builder.build()
     
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("stats", listar_competicoes))
+    app.add_handler(CommandHandler("metrics", metricas_command))
     app.add_handler(CallbackQueryHandler(callback_query_handler))
+
+    job_queue: JobQueue = app.job_queue
+    # Poller de placares AO VIVO (só consulta a API para ligas com jogo em andamento)
+    job_queue.run_repeating(atualizar_ao_vivo, interval=LIVE_POLL_SEGUNDOS, first=LIVE_POLL_SEGUNDOS, name="PollerAoVivo")
     
     if client:
-        job_queue: JobQueue = app.job_queue
         # Roda a atualização 1 vez na inicialização e depois a cada 1 hora (3600s)
         job_queue.run_repeating(atualizar_planilhas, interval=3600, first=0, name="AtualizacaoPlanilhas")
-        # Pré-carrega o cache de histórico
-        asyncio.run(pre_carregar_cache_sheets())
     else:
         logging.warning("Job Queue de atualização desativado: Conexão com GSheets não estabelecida.")
+    return app
+
+def main():
+    if not BOT_TOKEN or BOT_TOKEN == "SEU_TOKEN_AQUI":
+        logging.error("O token do bot não está configurado. Verifique a variável de ambiente BOT_TOKEN.")
+        sys.exit(1) # Finaliza o processo se o token estiver errado
+        
+    app = construir_aplicacao(BOT_TOKEN)
+    iniciar_servidor_metricas(METRICAS_PORTA)
     
     logging.info("Bot rodando. Pressione Ctrl+C para parar.")
     app.run_polling()